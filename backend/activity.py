@@ -0,0 +1,233 @@
+"""Activity feed events.
+
+Write paths record an ActivityEvent in the same transaction as the change it
+describes, so the feeds are a single indexed range scan over activity_event.
+Run this module to create events for history recorded before the log
+existed (--rebuild replaces any events already there):
+
+    python activity.py [--rebuild]
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, or_
+from sqlmodel import Session, select
+
+from models import (
+    ActivityEvent, ActivityType, Book, BookCopy, BorrowTransaction, DonationTransaction,
+    TransactionStatus, User
+)
+from rollups import add_to_rollup, rebuild_daily_stats
+from user_stats import adjust_user_stats
+
+# Shown on the library-wide feed; requests and rejections are only shown to the member
+PUBLIC_TYPES = [ActivityType.BORROW, ActivityType.DONATION, ActivityType.RETURN, ActivityType.MEMBER]
+
+# Shown to the admin who approved or rejected the request
+ADMIN_TYPES = [
+    ActivityType.BORROW, ActivityType.BORROW_REJECTED,
+    ActivityType.DONATION, ActivityType.DONATION_REJECTED,
+]
+
+def record_activity(
+    db: Session,
+    type: ActivityType,
+    user: User,
+    book: Optional[Book] = None,
+    transaction_id: Optional[int] = None,
+    admin_id: Optional[int] = None,
+    created_at: Optional[datetime] = None,
+):
+    """Add an event, its daily rollup and the member's counters to the caller's
+    transaction (caller commits)"""
+    created_at = created_at or datetime.now()
+    add_to_rollup(db, type, created_at)
+    adjust_user_stats(db, type, user.id)
+    db.add(ActivityEvent(
+        type=type,
+        user_id=user.id,
+        admin_id=admin_id,
+        book_id=book.id if book else None,
+        transaction_id=transaction_id,
+        user_name=user.name,
+        book_title=book.title if book else None,
+        created_at=created_at,
+    ))
+
+# Events are stamped before their transaction commits, so a late commit can
+# land behind a key a client has already seen. Paged feeds only show events
+# older than this, so cursors never move past one that may still commit.
+SETTLE_WINDOW = timedelta(seconds=5)
+
+def _feed(
+    db: Session,
+    query,
+    limit: int,
+    before: Optional[tuple] = None,
+    since: Optional[tuple] = None,
+    settled: bool = False,
+) -> List[ActivityEvent]:
+    """Run a feed query bounded by (created_at, id) keys, newest first.
+
+    With since, the events right after it are taken (oldest first) so a
+    client catching up pages forward through them; they are still returned
+    newest first. With settled, events from the last SETTLE_WINDOW are held
+    back, so as long as transactions commit within it a since poll never
+    skips an event and never repeats one.
+    """
+    created_at, event_id = ActivityEvent.created_at, ActivityEvent.id
+    if settled:
+        query = query.where(created_at <= datetime.now() - SETTLE_WINDOW)
+    if before is not None:
+        query = query.where((created_at < before[0]) | ((created_at == before[0]) & (event_id < before[1])))
+    if since is not None:
+        query = query.where((created_at > since[0]) | ((created_at == since[0]) & (event_id > since[1])))
+        events = db.exec(query.order_by(created_at, event_id).limit(limit)).all()
+        return events[::-1]
+    return db.exec(query.order_by(created_at.desc(), event_id.desc()).limit(limit)).all()
+
+def library_feed(
+    db: Session,
+    limit: int,
+    before: Optional[tuple] = None,
+    since: Optional[tuple] = None,
+    settled: bool = False,
+) -> List[ActivityEvent]:
+    """Newest public events across the library"""
+    query = select(ActivityEvent).where(ActivityEvent.type.in_(PUBLIC_TYPES))
+    return _feed(db, query, limit, before, since, settled)
+
+def user_feed(
+    db: Session,
+    user_id: int,
+    limit: int,
+    is_admin: bool = False,
+    newer_than: Optional[datetime] = None,
+    before: Optional[tuple] = None,
+    since: Optional[tuple] = None,
+    settled: bool = False,
+) -> List[ActivityEvent]:
+    """Newest events about a member, plus the requests they handled if they are an admin"""
+    condition = (ActivityEvent.user_id == user_id) & (ActivityEvent.type != ActivityType.MEMBER)
+    if is_admin:
+        # One query, so a request an admin handled for themselves appears once
+        handled = (ActivityEvent.admin_id == user_id) & ActivityEvent.type.in_(ADMIN_TYPES)
+        condition = or_(condition, handled)
+    query = select(ActivityEvent).where(condition)
+    if newer_than is not None:
+        query = query.where(ActivityEvent.created_at >= newer_than)
+    return _feed(db, query, limit, before, since, settled)
+
+_PUBLIC_DESCRIPTIONS = {
+    ActivityType.BORROW: '{name} ধার নিয়েছেন "{title}"',
+    ActivityType.DONATION: '{name} দান করেছেন "{title}"',
+    ActivityType.RETURN: '{name} ফেরত দিয়েছেন "{title}"',
+    ActivityType.MEMBER: "{name} নতুন সদস্য হিসেবে যোগ দিয়েছেন",
+}
+
+_OWN_DESCRIPTIONS = {
+    ActivityType.BORROW_REQUEST: 'আপনি ধার নেওয়ার অনুরোধ করেছেন "{title}"',
+    ActivityType.BORROW: 'আপনি ধার নিয়েছেন "{title}"',
+    ActivityType.BORROW_REJECTED: 'আপনার ধার নেওয়ার অনুরোধ প্রত্যাখ্যান করা হয়েছে "{title}"',
+    ActivityType.RETURN: 'আপনি ফেরত দিয়েছেন "{title}"',
+    ActivityType.DONATION_REQUEST: 'আপনি দান করার অনুরোধ করেছেন "{title}"',
+    ActivityType.DONATION: 'আপনি দান করেছেন "{title}"',
+    ActivityType.DONATION_REJECTED: 'আপনার দান করার অনুরোধ প্রত্যাখ্যান করা হয়েছে "{title}"',
+    ActivityType.MEMBER: "আপনি নতুন সদস্য হিসেবে যোগ দিয়েছেন",
+}
+
+# (feed type, description) for the admin who handled the request
+_ADMIN_DESCRIPTIONS = {
+    ActivityType.BORROW: ("admin_approve", 'আপনি অনুমোদন করেছেন {name} এর ধার নেওয়ার অনুরোধ "{title}"'),
+    ActivityType.BORROW_REJECTED: ("admin_reject", 'আপনি প্রত্যাখ্যান করেছেন {name} এর ধার নেওয়ার অনুরোধ "{title}"'),
+    ActivityType.DONATION: ("admin_approve", 'আপনি অনুমোদন করেছেন {name} এর দান করার অনুরোধ "{title}"'),
+    ActivityType.DONATION_REJECTED: ("admin_reject", 'আপনি প্রত্যাখ্যান করেছেন {name} এর দান করার অনুরোধ "{title}"'),
+}
+
+def describe_activity(event: ActivityEvent, viewer_id: Optional[int] = None) -> dict:
+    """Feed entry for an event, worded for the viewer if it is about them"""
+    kind = event.type.value
+    if viewer_id is None:
+        template = _PUBLIC_DESCRIPTIONS[event.type]
+    elif event.user_id == viewer_id:
+        template = _OWN_DESCRIPTIONS[event.type]
+    else:
+        kind, template = _ADMIN_DESCRIPTIONS[event.type]
+    return {
+        "id": f"{kind}_{event.id}",
+        "type": kind,
+        "description": template.format(name=event.user_name, title=event.book_title),
+        "timestamp": event.created_at,
+        "user_name": event.user_name,
+        "book_title": event.book_title,
+    }
+
+def backfill_activity(db: Session, rebuild: bool = False) -> int:
+    """Create events from users and transactions, returning how many were added.
+
+    Does nothing if events already exist, unless rebuild is set.
+    """
+    if rebuild:
+        db.exec(delete(ActivityEvent))
+    elif db.exec(select(ActivityEvent.id).limit(1)).first() is not None:
+        return 0
+
+    users = {user.id: user for user in db.exec(select(User)).all()}
+    books = {book.id: book for book in db.exec(select(Book)).all()}
+    copy_books = dict(db.exec(select(BookCopy.id, BookCopy.book_id)).all())
+
+    events = []
+    def add(type, user_id, book_id=None, transaction_id=None, admin_id=None, created_at=None):
+        user = users[user_id]
+        book = books.get(book_id)
+        events.append(ActivityEvent(
+            type=type, user_id=user_id, admin_id=admin_id, book_id=book_id,
+            transaction_id=transaction_id, user_name=user.name,
+            book_title=book.title if book else None, created_at=created_at,
+        ))
+
+    for user in users.values():
+        add(ActivityType.MEMBER, user.id, created_at=user.created_at)
+
+    for txn in db.exec(select(BorrowTransaction)).all():
+        book_id = copy_books.get(txn.book_copy_id)
+        add(ActivityType.BORROW_REQUEST, txn.user_id, book_id, txn.id, created_at=txn.created_at)
+        handled_at = txn.updated_at or txn.created_at
+        if txn.status == TransactionStatus.SUCCESS:
+            add(ActivityType.BORROW, txn.user_id, book_id, txn.id, txn.admin_id, handled_at)
+        elif txn.status == TransactionStatus.FAILED:
+            add(ActivityType.BORROW_REJECTED, txn.user_id, book_id, txn.id, txn.admin_id, handled_at)
+        if txn.return_date:
+            add(ActivityType.RETURN, txn.user_id, book_id, txn.id, created_at=txn.return_date)
+
+    for txn in db.exec(select(DonationTransaction)).all():
+        add(ActivityType.DONATION_REQUEST, txn.user_id, txn.book_id, txn.id, created_at=txn.created_at)
+        handled_at = txn.updated_at or txn.created_at
+        if txn.status == TransactionStatus.SUCCESS:
+            add(ActivityType.DONATION, txn.user_id, txn.book_id, txn.id, txn.admin_id, handled_at)
+        elif txn.status == TransactionStatus.FAILED:
+            add(ActivityType.DONATION_REJECTED, txn.user_id, txn.book_id, txn.id, txn.admin_id, handled_at)
+
+    # Insert in time order so IDs follow created_at
+    events.sort(key=lambda event: event.created_at)
+    db.add_all(events)
+    db.commit()
+    return len(events)
+
+if __name__ == "__main__":
+    import sys
+
+    from database import engine
+    from logging_config import setup_logging
+
+    logger = setup_logging()
+    rebuild = "--rebuild" in sys.argv[1:]
+    with Session(engine) as session:
+        added = backfill_activity(session, rebuild=rebuild)
+    if added or rebuild:
+        logger.info(f"Backfilled {added} activity event(s)")
+        with Session(engine) as session:
+            days = rebuild_daily_stats(session)
+        logger.info(f"Rebuilt daily statistics for {days} day(s) with activity")
+    else:
+        logger.info("Activity log already has events, nothing to backfill (use --rebuild to replace them)")
@@ -0,0 +1,188 @@
+"""Benchmark: how admin reports affect other requests on the same worker.
+
+Seeds a throwaway SQLite database, starts one uvicorn worker on it and keeps
+a few admin reports running while a probe hits /healthz every few
+milliseconds. Each report is served three ways:
+
+    blocking    async def handler on the sync Session (the original endpoints)
+    async       async def handler on AsyncSession, the helper driven by run_sync
+    threadpool  the real endpoint: def handler on the sync Session
+
+Probe latency shows how long unrelated requests wait behind the reports.
+
+    python bench_async_reports.py [--users N] [--loans N] [--concurrency N] [--seconds S]
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+MODES = {
+    "blocking": "/bench/blocking/users",
+    "async": "/bench/async/users",
+    "threadpool": "/admin/users/detailed",
+}
+
+def seed(users: int, loans: int):
+    from sqlalchemy import insert
+    from sqlmodel import Session
+
+    from database import create_tables, engine
+    from models import Book, BookCopy, BookStatus, BorrowTransaction, Role, RoleType, TransactionStatus, User
+
+    create_tables()
+    now = datetime.now()
+    random.seed(1)
+    with Session(engine) as session:
+        session.execute(insert(Role), [{"id": 1, "role_name": RoleType.ADMIN}, {"id": 2, "role_name": RoleType.USER}])
+        session.execute(insert(User), [
+            {"id": i, "name": f"Member {i}", "email": f"member{i}@example.com", "password": "-",
+             "role_id": 1 if i == 1 else 2, "created_at": now - timedelta(days=random.randint(0, 400))}
+            for i in range(1, users + 1)
+        ])
+        books = max(users // 4, 1)
+        session.execute(insert(Book), [
+            {"id": i, "title": f"Book {i}", "author": f"Author {i % 97}", "isbn": str(i), "category": "General",
+             "total_copies": 2, "available_copies": 2}
+            for i in range(1, books + 1)
+        ])
+        session.execute(insert(BookCopy), [
+            {"id": i, "book_id": (i - 1) // 2 + 1, "status": BookStatus.AVAILABLE} for i in range(1, books * 2 + 1)
+        ])
+        rows = []
+        for i in range(1, loans + 1):
+            created = now - timedelta(days=random.randint(0, 400))
+            returned = random.random() < 0.95
+            rows.append({
+                "book_copy_id": random.randint(1, books * 2),
+                "user_id": random.randint(2, users),
+                "status": TransactionStatus.SUCCESS,
+                "created_at": created,
+                "due_date": created + timedelta(days=14),
+                "return_date": created + timedelta(days=7) if returned else None,
+            })
+        session.execute(insert(BorrowTransaction), rows)
+        session.commit()
+
+    import main  # noqa: F401 - runs the startup backfills once, before timing starts
+
+def serve(port: int):
+    import uvicorn
+    from fastapi import Depends
+    from sqlmodel import Session
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    import main
+    from database import get_async_db
+
+    # The original handler: the query runs on the event loop
+    @main.app.get("/bench/blocking/users")
+    async def blocking_users(db: Session = Depends(main.get_db)):
+        return main.detailed_users(db)
+
+    # Only the driver I/O is awaited; the ORM work still runs on the loop
+    @main.app.get("/bench/async/users")
+    async def async_users(db: AsyncSession = Depends(get_async_db)):
+        return await db.run_sync(main.detailed_users)
+
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+async def measure(base_url: str, path: str, concurrency: int, seconds: float) -> dict:
+    import httpx
+
+    probes, reports = [], []
+    deadline = time.perf_counter() + seconds
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        (await client.get(path)).raise_for_status()  # warm up
+
+        async def report_worker():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                (await client.get(path)).raise_for_status()
+                reports.append(time.perf_counter() - started)
+
+        async def probe():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                (await client.get("/healthz")).raise_for_status()
+                probes.append(time.perf_counter() - started)
+                await asyncio.sleep(0.005)
+
+        await asyncio.gather(probe(), *(report_worker() for _ in range(concurrency)))
+
+    return {
+        "probe_p50": statistics.median(probes) * 1000,
+        "probe_p95": percentile(probes, 0.95) * 1000,
+        "probe_p99": percentile(probes, 0.99) * 1000,
+        "probe_max": max(probes) * 1000,
+        "report_p50": statistics.median(reports) * 1000,
+        "reports_per_s": len(reports) / seconds,
+    }
+
+def wait_for_port(server: subprocess.Popen, port: int, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and server.poll() is None:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def run(args):
+    directory = tempfile.mkdtemp(prefix="boiadda-bench-")
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{directory}/bench.db",
+        "SEED_DEMO_DATA": "false",
+        "DEBUG": "false",
+        "REMINDER_INTERVAL": "0",
+    }
+    subprocess.run([sys.executable, __file__, "--seed", "--users", str(args.users), "--loans", str(args.loans)],
+                   env=env, check=True, stdout=subprocess.DEVNULL)
+    port = free_port()
+    server = subprocess.Popen([sys.executable, __file__, "--serve", str(port)], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(server, port)
+        print(f"{args.users} members, {args.loans} loans, {args.concurrency} concurrent reports, {args.seconds}s per mode")
+        print(f"{'mode':<11} {'probe p50':>10} {'p95':>8} {'p99':>8} {'max':>8} {'report p50':>11} {'reports/s':>10}")
+        for mode, path in MODES.items():
+            result = asyncio.run(measure(f"http://127.0.0.1:{port}", path, args.concurrency, args.seconds))
+            print(f"{mode:<11} {result['probe_p50']:>8.1f}ms {result['probe_p95']:>6.1f}ms {result['probe_p99']:>6.1f}ms "
+                  f"{result['probe_max']:>6.1f}ms {result['report_p50']:>9.1f}ms {result['reports_per_s']:>10.1f}")
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--loans", type=int, default=50000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--seed", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.seed:
+        seed(args.users, args.loans)
+    elif args.serve:
+        serve(args.serve)
+    else:
+        run(args)
@@ -0,0 +1,132 @@
+"""Benchmark: login throughput and what a login burst does to catalog reads.
+
+Starts one uvicorn worker on a throwaway database with the demo data. Many
+clients log in at once, backing off as told by Retry-After on 503, while a
+probe reads GET /books/. Logins are served two ways:
+
+    threadpool  the old sync handler: bcrypt in the threadpool sync endpoints share
+    pool        /auth/login: bcrypt on the bounded password hashing pool
+
+    python bench_login.py [--clients N] [--seconds S] [--hash-workers N] [--hash-queue N]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_async_reports import free_port, percentile, wait_for_port
+
+MODES = {
+    "threadpool": "/bench/threadpool/login",
+    "pool": "/auth/login",
+}
+
+CREDENTIALS = {"email": "tanvir@example.com", "password": "userpass2"}
+
+def serve(port: int):
+    import uvicorn
+    from fastapi import Depends, HTTPException
+    from sqlmodel import Session, select
+
+    import main
+    from security import verify_password
+
+    # The pre-pool handler
+    @main.app.post("/bench/threadpool/login")
+    def threadpool_login(login_data: main.UserLogin, db: Session = Depends(main.get_db)):
+        user = db.exec(select(main.User).where(main.User.email == login_data.email)).first()
+        if not user or not verify_password(login_data.password, user.password):
+            raise HTTPException(401, detail="Invalid email or password")
+        return {"id": user.id}
+
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+async def measure(base_url: str, path: str, clients: int, seconds: float) -> dict:
+    import httpx
+
+    logins, rejected, reads = [], [], []
+    started_at = time.perf_counter()
+    deadline = started_at + seconds
+    limits = httpx.Limits(max_connections=clients + 1)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        (await client.post(path, json=CREDENTIALS)).raise_for_status()  # warm up
+
+        async def login_client():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.post(path, json=CREDENTIALS)
+                if response.status_code == 503:
+                    rejected.append(int(response.headers.get("Retry-After", "1")))
+                    await asyncio.sleep(rejected[-1])
+                    continue
+                response.raise_for_status()
+                logins.append(time.perf_counter() - started)
+
+        async def catalog_probe():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                (await client.get("/books/")).raise_for_status()
+                reads.append(time.perf_counter() - started)
+                await asyncio.sleep(0.05)
+
+        await asyncio.gather(catalog_probe(), *(login_client() for _ in range(clients)))
+        # Logins queued before the deadline can finish well after it
+        elapsed = time.perf_counter() - started_at
+
+    return {
+        "logins_per_s": len(logins) / elapsed,
+        "login_p50": statistics.median(logins) * 1000 if logins else 0.0,
+        "login_p99": percentile(logins, 0.99) * 1000 if logins else 0.0,
+        "rejected": len(rejected),
+        "read_p50": statistics.median(reads) * 1000,
+        "read_p99": percentile(reads, 0.99) * 1000,
+        "read_max": max(reads) * 1000,
+    }
+
+def run(args):
+    directory = tempfile.mkdtemp(prefix="boiadda-bench-")
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{directory}/bench.db",
+        "SEED_DEMO_DATA": "true",
+        "DEBUG": "false",
+        "REMINDER_INTERVAL": "0",
+        "RESPONSE_CACHE_SIZE": "0",
+        "PASSWORD_HASH_WORKERS": str(args.hash_workers),
+        "PASSWORD_HASH_QUEUE": str(args.hash_queue),
+    }
+    port = free_port()
+    server = subprocess.Popen([sys.executable, __file__, "--serve", str(port)], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(server, port)
+        print(f"{args.clients} clients logging in, {args.seconds}s per mode, "
+              f"pool of {args.hash_workers} thread(s) + {args.hash_queue} queued")
+        print(f"{'mode':<11} {'logins/s':>9} {'login p50':>10} {'p99':>9} {'503s':>6} "
+              f"{'/books/ p50':>12} {'p99':>9} {'max':>9}")
+        for mode, path in MODES.items():
+            result = asyncio.run(measure(f"http://127.0.0.1:{port}", path, args.clients, args.seconds))
+            print(f"{mode:<11} {result['logins_per_s']:>9.1f} {result['login_p50']:>8.0f}ms {result['login_p99']:>7.0f}ms "
+                  f"{result['rejected']:>6} {result['read_p50']:>10.1f}ms {result['read_p99']:>7.1f}ms "
+                  f"{result['read_max']:>7.1f}ms")
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--hash-workers", type=int, default=2)
+    parser.add_argument("--hash-queue", type=int, default=16)
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.serve)
+    else:
+        run(args)
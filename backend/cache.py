@@ -0,0 +1,75 @@
+"""In-process response cache for public read endpoints.
+
+Entries are keyed by route plus sorted query parameters, and each one
+remembers the data version (ETag) it was built from. A commit that writes a
+resource bumps its version, so a lookup with the new version misses and
+replaces the entry. This works across workers because the versions live in
+the database. TTL and LRU eviction keep memory bounded.
+
+Another backend (e.g. Redis) only needs the same get/set/clear/stats methods.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from fastapi import Request
+
+from config import settings
+
+def cache_key(request: Request) -> str:
+    """Route path plus query parameters in a stable order"""
+    params = "&".join(f"{name}={value}" for name, value in sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{params}"
+
+class ResponseCache:
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (version, expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str, version: str) -> Optional[Any]:
+        """Get a cached value built from the given data version"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version or entry[1] < time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key: str, version: str, value: Any) -> Any:
+        """Store a value and return it"""
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return value
+        with self._lock:
+            self._entries[key] = (version, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_SIZE, settings.RESPONSE_CACHE_TTL)
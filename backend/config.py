@@ -26,6 +26,24 @@ class Settings(BaseSettings):
         """Convert CORS_ORIGINS string to list"""
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",") if origin.strip()]
 
+    # Response cache (0 disables it)
+    RESPONSE_CACHE_SIZE: int = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+    RESPONSE_CACHE_TTL: float = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+
+    # Seconds the homepage statistics snapshot is served before a background refresh
+    STATS_REFRESH_SECONDS: float = float(os.getenv("STATS_REFRESH_SECONDS", "30"))
+
+    # Seconds between loan reminder runs in each worker (0 disables them)
+    REMINDER_INTERVAL: float = float(os.getenv("REMINDER_INTERVAL", "300"))
+
+    # Threads per worker that run bcrypt, and how many more hashes may wait before logins get 503
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_QUEUE: int = int(os.getenv("PASSWORD_HASH_QUEUE", "16"))
+
+    # Event-loop lag sampling period (0 disables it) and the stall that gets logged with a stack
+    LOOP_MONITOR_INTERVAL: float = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.1"))
+    LOOP_BLOCK_THRESHOLD: float = float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.1"))
+
     # Features
     SEED_DEMO_DATA: bool = os.getenv("SEED_DEMO_DATA", "true").lower() == "true" and ENVIRONMENT != "production"
 
@@ -0,0 +1,125 @@
+"""Per-book copy counters (total, available, borrowed) stored on Book.
+
+Counters are changed with relative UPDATEs in the same transaction as the
+copy they describe, so concurrent requests can't lose an update. Run this
+module to recompute them from book_copy and report any drift:
+
+    python counters.py
+"""
+from typing import List
+
+from sqlalchemy import case, update
+from sqlmodel import Session, select, func
+
+from models import Book, BookCopy, BookStatus
+
+def _adjust(db: Session, book_id: int, total: int = 0, available: int = 0, borrowed: int = 0):
+    db.exec(
+        update(Book)
+        .where(Book.id == book_id)
+        .values(
+            total_copies=Book.total_copies + total,
+            available_copies=Book.available_copies + available,
+            borrowed_copies=Book.borrowed_copies + borrowed,
+        )
+    )
+
+def _status_deltas(status: BookStatus, sign: int) -> dict:
+    if status == BookStatus.AVAILABLE:
+        return {"available": sign}
+    if status == BookStatus.BORROWED:
+        return {"borrowed": sign}
+    return {}
+
+def add_copy(db: Session, copy: BookCopy):
+    """Add a new copy, counting it on its book (caller commits)"""
+    db.add(copy)
+    _adjust(db, copy.book_id, total=1, **_status_deltas(copy.status, 1))
+
+def set_copy_status(db: Session, copy: BookCopy, status: BookStatus):
+    """Change a copy's status, moving it between its book's counters (caller commits)"""
+    if copy.status == status:
+        return
+    deltas = _status_deltas(copy.status, -1)
+    for name, value in _status_deltas(status, 1).items():
+        deltas[name] = deltas.get(name, 0) + value
+    copy.status = status
+    db.add(copy)
+    _adjust(db, copy.book_id, **deltas)
+
+def _actual_counts():
+    return (
+        select(
+            BookCopy.book_id,
+            func.count(BookCopy.id).label("total"),
+            func.sum(case((BookCopy.status == BookStatus.AVAILABLE, 1), else_=0)).label("available"),
+            func.sum(case((BookCopy.status == BookStatus.BORROWED, 1), else_=0)).label("borrowed"),
+        )
+        .group_by(BookCopy.book_id)
+        .subquery()
+    )
+
+def reconcile_book_counters(db: Session) -> List[dict]:
+    """Recompute every book's counters from book_copy, returning the drift found"""
+    actual = _actual_counts()
+    total = func.coalesce(actual.c.total, 0)
+    available = func.coalesce(actual.c.available, 0)
+    borrowed = func.coalesce(actual.c.borrowed, 0)
+    rows = db.exec(
+        select(
+            Book.id, Book.total_copies, Book.available_copies, Book.borrowed_copies,
+            total, available, borrowed
+        )
+        .outerjoin(actual, actual.c.book_id == Book.id)
+        .where(
+            (Book.total_copies != total) |
+            (Book.available_copies != available) |
+            (Book.borrowed_copies != borrowed)
+        )
+    ).all()
+
+    drift = []
+    for book_id, stored_total, stored_available, stored_borrowed, real_total, real_available, real_borrowed in rows:
+        drift.append({
+            "book_id": book_id,
+            "total_copies": (stored_total, real_total),
+            "available_copies": (stored_available, real_available),
+            "borrowed_copies": (stored_borrowed, real_borrowed),
+        })
+
+    if drift:
+        # Correlated subqueries make each row's fix a single atomic statement
+        def count_where(*conditions):
+            return (
+                select(func.count(BookCopy.id))
+                .where(BookCopy.book_id == Book.id, *conditions)
+                .scalar_subquery()
+            )
+        db.exec(
+            update(Book)
+            .where(Book.id.in_([row["book_id"] for row in drift]))
+            .values(
+                total_copies=count_where(),
+                available_copies=count_where(BookCopy.status == BookStatus.AVAILABLE),
+                borrowed_copies=count_where(BookCopy.status == BookStatus.BORROWED),
+            )
+        )
+        db.commit()
+
+    return drift
+
+if __name__ == "__main__":
+    from database import engine
+    from logging_config import setup_logging
+
+    logger = setup_logging()
+    with Session(engine) as session:
+        drift = reconcile_book_counters(session)
+    for row in drift:
+        changes = ", ".join(
+            f"{name} {row[name][0]} -> {row[name][1]}"
+            for name in ("total_copies", "available_copies", "borrowed_copies")
+            if row[name][0] != row[name][1]
+        )
+        logger.warning(f"Book {row['book_id']}: {changes}")
+    logger.info(f"Reconciled copy counters, {len(drift)} book(s) had drifted")
@@ -0,0 +1,76 @@
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import models  # noqa: F401 - registers tables on SQLModel.metadata
+import versions  # noqa: F401 - registers the version bump session events
+from config import settings
+from search import create_search_index
+
+logger = logging.getLogger("boiadda")
+
+# Use environment-based database URL
+engine = create_engine(
+    settings.DATABASE_URL,
+    echo=settings.DEBUG,
+    connect_args={"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {}
+)
+
+def async_database_url(url: str) -> str:
+    """The same database through an asyncio driver (aiosqlite or asyncpg)"""
+    scheme, _, rest = url.partition("://")
+    if scheme in ("sqlite", "sqlite+pysqlite"):
+        return f"sqlite+aiosqlite://{rest}"
+    if scheme in ("postgres", "postgresql", "postgresql+psycopg2"):
+        return f"postgresql+asyncpg://{rest}"
+    return url
+
+# For async endpoints, so their queries don't block the event loop
+async_engine = create_async_engine(async_database_url(settings.DATABASE_URL), echo=settings.DEBUG)
+
+def add_missing_columns():
+    """Add columns introduced after a table was created.
+
+    New columns must declare a server default so existing rows get a value.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+                if column.server_default is not None:
+                    ddl += f" NOT NULL DEFAULT {column.server_default.arg}"
+                conn.execute(text(ddl))
+                logger.info(f"Added column {table.name}.{column.name}")
+
+def create_tables():
+    # Safe table creation - only create if doesn't exist
+    SQLModel.metadata.create_all(engine)
+    add_missing_columns()
+    # create_all skips indexes on tables that already exist, so add any missing ones
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(engine, checkfirst=True)
+            except IntegrityError:
+                # Unique index over existing duplicates: keep running, but say so
+                logger.error(f"Could not create unique index {index.name}: existing rows in {table.name} have duplicates")
+    create_search_index(engine)
+
+def get_db():
+    with Session(engine) as session:
+        yield session
+
+async def get_async_db():
+    async with AsyncSession(async_engine) as session:
+        yield session
@@ -0,0 +1,200 @@
+"""Live library events for Server-Sent Events subscribers.
+
+The activity_event log is the source of truth, so changes committed by any
+worker reach every subscriber. Each worker runs one poller while it has
+subscribers and fans new events out to them. Queues are bounded; a
+subscriber that falls behind is disconnected and catches up by reconnecting
+with Last-Event-ID, which replays from the log.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import List, Optional, Set
+
+from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
+
+from activity import PUBLIC_TYPES, describe_activity
+from database import engine
+from models import ActivityEvent, ActivityType, Book
+
+logger = logging.getLogger("boiadda")
+
+TOPICS = {"activity", "pending", "handled", "availability"}
+
+POLL_SECONDS = 1.0
+HEARTBEAT_SECONDS = 15.0
+QUEUE_SIZE = 100
+BATCH_SIZE = 500
+REPLAY_LIMIT = 500
+
+# IDs can commit out of order under concurrent writers; a hole in the
+# sequence is waited for this long before it is assumed to be a rollback
+GAP_SECONDS = 10.0
+
+_PENDING_TYPES = {ActivityType.BORROW_REQUEST: "borrow", ActivityType.DONATION_REQUEST: "donation"}
+_HANDLED_TYPES = {
+    ActivityType.BORROW: ("borrow", "approved"),
+    ActivityType.BORROW_REJECTED: ("borrow", "rejected"),
+    ActivityType.DONATION: ("donation", "approved"),
+    ActivityType.DONATION_REJECTED: ("donation", "rejected"),
+}
+# Events that change how many copies of a book can be borrowed
+_AVAILABILITY_TYPES = {ActivityType.BORROW, ActivityType.RETURN, ActivityType.DONATION}
+
+def format_sse(event_id: int, name: str, data: dict) -> str:
+    return f"id: {event_id}\nevent: {name}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+def build_messages(db: Session, events: List[ActivityEvent]) -> List[tuple]:
+    """Turn activity events into (event id, topic, SSE message) tuples"""
+    book_ids = {event.book_id for event in events if event.type in _AVAILABILITY_TYPES and event.book_id}
+    available = dict(db.exec(
+        select(Book.id, Book.available_copies).where(Book.id.in_(book_ids))
+    ).all()) if book_ids else {}
+
+    messages = []
+    for event in events:
+        if event.type in PUBLIC_TYPES:
+            messages.append((event.id, "activity", format_sse(event.id, "activity", describe_activity(event))))
+        if event.type in _PENDING_TYPES:
+            messages.append((event.id, "pending", format_sse(event.id, "pending", {
+                "type": _PENDING_TYPES[event.type],
+                "transaction_id": event.transaction_id,
+                "user_id": event.user_id,
+                "user_name": event.user_name,
+                "book_id": event.book_id,
+                "book_title": event.book_title,
+                "created_at": event.created_at,
+            })))
+        if event.type in _HANDLED_TYPES:
+            kind, outcome = _HANDLED_TYPES[event.type]
+            messages.append((event.id, "handled", format_sse(event.id, "handled", {
+                "type": kind,
+                "transaction_id": event.transaction_id,
+                "status": outcome,
+                "admin_id": event.admin_id,
+            })))
+        if event.type in _AVAILABILITY_TYPES and event.book_id in available:
+            # Current count rather than a delta, so replays and repeats are harmless
+            messages.append((event.id, "availability", format_sse(event.id, "availability", {
+                "book_id": event.book_id,
+                "available_copies": available[event.book_id],
+            })))
+    return messages
+
+class Subscriber:
+    def __init__(self, topics: Set[str]):
+        self.topics = topics
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+class EventBroker:
+    def __init__(self):
+        self._subscribers: Set[Subscriber] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._floor = 0  # Every event with an ID up to here has been published
+        self._published: Set[int] = set()  # Published IDs above the floor
+        self._gap_since: Optional[float] = None
+
+    def _latest_id(self) -> int:
+        with Session(engine) as session:
+            return session.exec(select(ActivityEvent.id).order_by(ActivityEvent.id.desc()).limit(1)).first() or 0
+
+    def _fetch(self, after_id: int, limit: int) -> tuple:
+        with Session(engine) as session:
+            events = session.exec(
+                select(ActivityEvent).where(ActivityEvent.id > after_id).order_by(ActivityEvent.id).limit(limit)
+            ).all()
+            return [event.id for event in events], build_messages(session, events)
+
+    async def subscribe(self, topics: Set[str]) -> Subscriber:
+        subscriber = Subscriber(topics)
+        self._subscribers.add(subscriber)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll())
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    async def replay(self, after_id: int, topics: Set[str]) -> List[tuple]:
+        """Messages for events after the given ID, for reconnecting clients"""
+        _, messages = await run_in_threadpool(self._fetch, after_id, REPLAY_LIMIT)
+        return [message for message in messages if message[1] in topics]
+
+    def _publish(self, messages: List[tuple]):
+        for subscriber in list(self._subscribers):
+            for message in messages:
+                if message[1] not in subscriber.topics:
+                    continue
+                try:
+                    subscriber.queue.put_nowait(message)
+                except asyncio.QueueFull:
+                    subscriber.overflowed = True
+                    self._subscribers.discard(subscriber)
+                    break
+
+    def _advance(self, event_ids: List[int]):
+        self._published.update(event_ids)
+        while self._floor + 1 in self._published:
+            self._floor += 1
+            self._published.remove(self._floor)
+        if not self._published:
+            self._gap_since = None
+        elif self._gap_since is None:
+            self._gap_since = time.monotonic()
+        elif time.monotonic() - self._gap_since > GAP_SECONDS:
+            # The missing IDs were rolled back; skip past them
+            self._floor = min(self._published) - 1
+            self._gap_since = None
+            self._advance([])
+
+    async def _poll(self):
+        # Start from the newest event; earlier ones are only sent as replays
+        self._floor = None
+        self._published.clear()
+        self._gap_since = None
+        while self._subscribers:
+            try:
+                if self._floor is None:
+                    self._floor = await run_in_threadpool(self._latest_id)
+                event_ids, messages = await run_in_threadpool(self._fetch, self._floor, BATCH_SIZE)
+            except Exception as e:
+                logger.error(f"Event stream poll failed: {e}")
+                await asyncio.sleep(POLL_SECONDS)
+                continue
+            fresh = {event_id for event_id in event_ids if event_id not in self._published}
+            self._publish([message for message in messages if message[0] in fresh])
+            self._advance(event_ids)
+            if len(event_ids) < BATCH_SIZE:
+                await asyncio.sleep(POLL_SECONDS)
+
+    async def stream(self, subscriber: Subscriber, replay: List[tuple]):
+        """Yield SSE text: the replay first, then live messages and heartbeats"""
+        replayed = {event_id for event_id, _, _ in replay}
+        try:
+            yield f"retry: {int(POLL_SECONDS * 3000)}\n\n"
+            for _, _, message in replay:
+                yield message
+            while not subscriber.overflowed:
+                try:
+                    event_id, _, message = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                # Subscribing happens before the replay, so it may repeat
+                if event_id not in replayed:
+                    yield message
+        finally:
+            self.unsubscribe(subscriber)
+
+def parse_topics(value: Optional[str]) -> Set[str]:
+    if not value:
+        return set(TOPICS)
+    return {topic.strip() for topic in value.split(",") if topic.strip() in TOPICS}
+
+event_broker = EventBroker()
@@ -0,0 +1,140 @@
+"""In-memory character n-gram index for typo-tolerant book search.
+
+Each worker keeps its own copy. Books are only ever inserted, so a worker
+catches up on books added elsewhere by loading rows past the highest ID its
+last refresh read. That watermark only moves on refresh: a book this worker
+indexes itself may have a higher ID than books other workers are still
+committing, so each refresh also rescans the last RESCAN_IDS IDs below it.
+"""
+import heapq
+import threading
+from collections import Counter
+from operator import itemgetter
+from typing import Dict, List, Set, Tuple
+
+from sqlmodel import Session, select
+
+from models import Book
+from search import normalize, tokenize
+
+NGRAM_SIZE = 3
+MIN_SIMILARITY = 0.3
+AUTHOR_WEIGHT = 0.8
+
+# Bound the work per query: very common n-grams are skipped once rarer ones
+# have produced candidates, and only the best candidates are scored
+MAX_POSTINGS = 2000
+MAX_CANDIDATES = 500
+
+# IDs below the refresh watermark checked again, for inserts that commit out of order
+RESCAN_IDS = 50
+
+# Spellings Bengali readers commonly mix up are folded together
+BENGALI_FOLDS = str.maketrans({
+    "\u09c0": "\u09bf",  # ী -> ি
+    "\u09c2": "\u09c1",  # ূ -> ু
+    "\u0988": "\u0987",  # ঈ -> ই
+    "\u098a": "\u0989",  # ঊ -> উ
+    "\u09a3": "\u09a8",  # ণ -> ন
+    "\u09b6": "\u09b8",  # শ -> স
+    "\u09b7": "\u09b8",  # ষ -> স
+    "\u09ce": "\u09a4",  # ৎ -> ত
+    "\u0981": None,       # chandrabindu
+    "\u09bc": None,       # nukta (য় -> য, ড় -> ড)
+})
+
+def ngrams(value: str) -> Set[str]:
+    """Get the padded character n-grams of every word in the text"""
+    grams = set()
+    for token in tokenize(normalize(value).translate(BENGALI_FOLDS)):
+        padded = " " * (NGRAM_SIZE - 1) + token + " "
+        for i in range(len(padded) - NGRAM_SIZE + 1):
+            grams.add(padded[i:i + NGRAM_SIZE])
+    return grams
+
+def similarity(query_grams: Set[str], field_grams: Set[str]) -> float:
+    """Score how well a field matches the query, mostly by query coverage"""
+    if not query_grams or not field_grams:
+        return 0.0
+    shared = len(query_grams & field_grams)
+    return 0.7 * shared / len(query_grams) + 0.3 * shared / len(field_grams)
+
+class NgramIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Set[int]] = {}
+        self._fields: Dict[int, Tuple[Set[str], Set[str]]] = {}
+        self._refreshed_up_to = 0  # Highest book ID a refresh has read
+
+    def add(self, book_id: int, title: str, author: str):
+        """Index a book's title and author, replacing any previous entry"""
+        title_grams = ngrams(title)
+        author_grams = ngrams(author)
+        with self._lock:
+            self._remove(book_id)
+            self._fields[book_id] = (title_grams, author_grams)
+            for gram in title_grams | author_grams:
+                self._postings.setdefault(gram, set()).add(book_id)
+
+    def _remove(self, book_id: int):
+        fields = self._fields.pop(book_id, None)
+        if fields is None:
+            return
+        for gram in fields[0] | fields[1]:
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(book_id)
+                if not postings:
+                    del self._postings[gram]
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._fields.clear()
+            self._refreshed_up_to = 0
+
+    def refresh(self, db: Session):
+        """Index books added since the last refresh"""
+        books = db.exec(
+            select(Book.id, Book.title, Book.author)
+            .where(Book.id > self._refreshed_up_to - RESCAN_IDS)
+            .order_by(Book.id)
+        ).all()
+        for book_id, title, author in books:
+            if book_id not in self._fields:
+                self.add(book_id, title, author)
+        if books:
+            self._refreshed_up_to = max(self._refreshed_up_to, books[-1][0])
+
+    def search(self, query: str, limit: int = 20) -> List[int]:
+        """Get IDs of books similar to the query, best match first"""
+        query_grams = ngrams(query)
+        if not query_grams:
+            return []
+
+        with self._lock:
+            # Count shared n-grams per book, rarest n-grams first
+            postings = sorted(
+                (self._postings[gram] for gram in query_grams if gram in self._postings),
+                key=len
+            )
+            counts = Counter()
+            for book_ids in postings:
+                if counts and len(book_ids) > MAX_POSTINGS:
+                    break
+                counts.update(book_ids)
+
+            candidates = heapq.nlargest(MAX_CANDIDATES, counts.items(), key=itemgetter(1))
+            scored = []
+            for book_id, _ in candidates:
+                title_grams, author_grams = self._fields[book_id]
+                score = max(
+                    similarity(query_grams, title_grams),
+                    AUTHOR_WEIGHT * similarity(query_grams, author_grams)
+                )
+                if score >= MIN_SIMILARITY:
+                    scored.append((-score, book_id))
+
+        return [book_id for _, book_id in heapq.nsmallest(limit, scored)]
+
+book_index = NgramIndex()
@@ -0,0 +1,130 @@
+"""Event-loop lag monitor.
+
+A background task sleeps LOOP_MONITOR_INTERVAL seconds at a time and
+records how late it wakes up: that lag is how long every other request on
+the worker waited for the loop. Percentiles over the recent samples are
+served by GET /metrics.
+
+A watchdog thread checks the loop's progress every half threshold. When the
+loop is more than LOOP_BLOCK_THRESHOLD seconds late it captures the loop
+thread's stack (and the route it is serving), and the warning is logged once
+the loop is free again. Nothing runs on the request path, so it is cheap to
+leave on.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+
+from config import settings
+
+logger = logging.getLogger("boiadda")
+
+STACK_LIMIT = 25
+
+def _route(frame) -> str:
+    """The request being served by the innermost ASGI frame of a stack, if any"""
+    while frame is not None:
+        scope = frame.f_locals.get("scope")
+        if isinstance(scope, dict) and scope.get("type") == "http":
+            route = scope.get("route")
+            return f'{scope.get("method")} {getattr(route, "path", scope.get("path"))}'
+        frame = frame.f_back
+    return "no request"
+
+def _percentile(ordered: list, fraction: float) -> float:
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+class LoopMonitor:
+    def __init__(self, interval: float, threshold: float, window: int = 1000):
+        self.interval = interval
+        self.threshold = threshold
+        self.blocked = 0  # Stalls longer than the threshold since start
+        self._lags = deque(maxlen=window)
+        self._max_lag = 0.0
+        self._deadline: Optional[float] = None  # When the current sleep should end
+        self._capture: Optional[tuple] = None  # (deadline, route, stack) from the watchdog
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self.interval <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self._loop_thread = threading.get_ident()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._run())
+        if self.threshold > 0:
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    async def _run(self):
+        while True:
+            deadline = time.perf_counter() + self.interval
+            self._deadline = deadline
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - deadline, 0.0)
+            self._deadline = None
+            self._lags.append(lag)
+            self._max_lag = max(self._max_lag, lag)
+            if self.threshold > 0 and lag >= self.threshold:
+                self._report(deadline, lag)
+
+    def _report(self, deadline: float, lag: float):
+        self.blocked += 1
+        capture, self._capture = self._capture, None
+        if capture is None or capture[0] != deadline:
+            logger.warning(f"Event loop blocked for {lag * 1000:.0f}ms")
+            return
+        _, route, stack = capture
+        logger.warning(f"Event loop blocked for {lag * 1000:.0f}ms in {route}, stack while blocked:\n{stack}")
+
+    def _watch(self):
+        while not self._stopped.wait(self.threshold / 2):
+            deadline = self._deadline
+            if deadline is None or time.perf_counter() - deadline < self.threshold:
+                continue
+            if self._capture is not None and self._capture[0] == deadline:
+                continue  # Already captured this stall
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                stack = "".join(traceback.format_stack(frame, limit=STACK_LIMIT))
+                self._capture = (deadline, _route(frame), stack)
+
+    def snapshot(self) -> dict:
+        """Lag percentiles over the recent samples, in milliseconds"""
+        ordered = sorted(self._lags)
+        if not ordered:
+            return {"enabled": self.interval > 0, "samples": 0, "blocked": self.blocked}
+        return {
+            "enabled": True,
+            "samples": len(ordered),
+            "interval_ms": self.interval * 1000,
+            "lag_p50_ms": round(_percentile(ordered, 0.5) * 1000, 2),
+            "lag_p90_ms": round(_percentile(ordered, 0.9) * 1000, 2),
+            "lag_p99_ms": round(_percentile(ordered, 0.99) * 1000, 2),
+            "lag_max_ms": round(ordered[-1] * 1000, 2),
+            "lag_max_since_start_ms": round(self._max_lag * 1000, 2),
+            "block_threshold_ms": self.threshold * 1000,
+            "blocked": self.blocked,
+        }
+
+loop_monitor = LoopMonitor(settings.LOOP_MONITOR_INTERVAL, settings.LOOP_BLOCK_THRESHOLD)
@@ -1,39 +1,55 @@
-from typing import Optional, List
-from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, List
+from datetime import date, datetime, timedelta
+from enum import Enum
+import base64
+import json
 import logging
+import os
 import time
 import uuid
 
-from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from sqlmodel import SQLModel, Session, create_engine, select, func
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import case, delete
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import SQLModel, Session, select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic import BaseModel
 
 from models import *
 from config import settings
-from security import get_password_hash, verify_password, create_access_token, get_current_user_id
+from security import (
+    check_password, create_access_token, get_current_user_id, get_password_hash, hash_password, password_hasher,
+)
 from logging_config import setup_logging
+from activity import backfill_activity, describe_activity, library_feed, record_activity, user_feed
+from events import event_broker, parse_topics
+from loop_monitor import loop_monitor
+from reminders import reminder_scheduler, send_loan_reminders
+from notifications import (
+    active_announcements, adjust_announcement_unread, announcement_targets, backfill_notifications,
+    handled_message, inbox, is_announcement_visible, mark_all_read, mark_read, notify,
+    read_state, reconcile_unread_counts, welcome_message, ReadState
+)
+from counters import add_copy, reconcile_book_counters, set_copy_status
+from cache import cache_key, response_cache
+from versions import current_etag, ensure_version_rows, etag_matches, latest_version
+from fuzzy import book_index
+from suggest import suggestion_index
+from stats import library_counts, library_stats
+from rollups import BUCKETS, backfill_daily_stats, timeseries
+from user_stats import COUNTERS as USER_COUNTERS, reconcile_user_stats, user_summary
+from search import index_book, rebuild_search_index, search_book_ids, sync_search_index
 
 # ===== LOGGING SETUP =====
 logger = setup_logging()
 
 # ===== DB SETUP =====
 
-# Use environment-based database URL
-engine = create_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    connect_args={"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {}
-)
-
-def create_tables():
-    # Safe table creation - only create if doesn't exist
-    SQLModel.metadata.create_all(engine)
-
-def get_db():
-    with Session(engine) as session:
-        yield session
+from database import engine, create_tables, get_async_db, get_db
 
 # ===== SAMPLE DATA =====
 
@@ -100,12 +116,19 @@ def populate_sample_data():
         for copy in sample_copies:
             session.add(copy)
         session.commit()
+        reconcile_book_counters(session)
+        backfill_activity(session)
+        backfill_daily_stats(session)
+        reconcile_user_stats(session)
+        backfill_notifications(session)
         
         logger.info("✅ Sample data populated successfully!")
 
 # Initialize database and populate sample data (only if enabled in settings)
 def initialize_database():
     create_tables()
+    with Session(engine) as session:
+        ensure_version_rows(session)
     # Only seed demo data if enabled in settings
     if settings.SEED_DEMO_DATA:
         with Session(engine) as session:
@@ -114,16 +137,44 @@ def initialize_database():
                 populate_sample_data()
             else:
                 logger.info("✅ Database already contains data. Skipping sample data population.")
+    with Session(engine) as session:
+        drift = reconcile_book_counters(session)
+        if drift:
+            logger.warning(f"Corrected copy counters for {len(drift)} book(s)")
+        backfilled = backfill_activity(session)
+        if backfilled:
+            logger.info(f"Backfilled {backfilled} activity event(s) from existing history")
+        days = backfill_daily_stats(session)
+        if days:
+            logger.info(f"Built daily statistics for {days} day(s) from the activity log")
+        wrong = reconcile_user_stats(session)
+        if wrong:
+            logger.info(f"Recomputed borrow/donation counters for {wrong} member(s)")
+        backfilled = backfill_notifications(session)
+        if backfilled:
+            logger.info(f"Stored {backfilled} notification(s) from recent history")
+        sync_search_index(session)
+        book_index.refresh(session)
+        suggestion_index.refresh(session)
 
 initialize_database()
 
 # ===== FASTAPI APP =====
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop_monitor.start()
+    reminder_scheduler.start()
+    yield
+    await reminder_scheduler.stop()
+    await loop_monitor.stop()
+
 app = FastAPI(
     title="BoiAdda Library API",
     description="A modern library management system",
     version="1.0.0",
-    debug=settings.DEBUG
+    debug=settings.DEBUG,
+    lifespan=lifespan
 )
 
 # Logging middleware
@@ -170,6 +221,29 @@ def readiness_check(db: Session = Depends(get_db)):
         logger.error(f"Readiness check failed: {e}")
         raise HTTPException(status_code=503, detail="Service not ready")
 
+# ===== CONDITIONAL GET =====
+
+def conditional_get(*resources: str, extra=None):
+    """Dependency answering 304 Not Modified while none of the resources changed.
+
+    extra, if given, returns a suffix for responses that also depend on
+    something other than stored data (e.g. the current hour). Endpoints can
+    take the dependency as a parameter to get the ETag, e.g. to key the
+    response cache.
+    """
+    def dependency(request: Request, response: Response, db: Session = Depends(get_db)):
+        etag = current_etag(db, resources)
+        if extra is not None:
+            etag = f'{etag[:-1]}-{extra()}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, etag):
+            raise HTTPException(304, headers=headers)
+        response.headers.update(headers)
+        return etag
+
+    return Depends(dependency)
+
 # ===== RESPONSE MODELS =====
 
 from pydantic import BaseModel
@@ -185,6 +259,20 @@ class BookInfo(BaseModel):
     cover_img: Optional[str] = None
     user_can_borrow: bool = True  # New field to indicate if user can borrow this book
 
+class Suggestion(BaseModel):
+    text: str
+    type: str  # 'title', 'author', 'category'
+    book_id: Optional[int] = None  # Set for title suggestions
+
+class BookSort(str, Enum):
+    TITLE = "title"
+    NEWEST = "newest"
+    MOST_AVAILABLE = "most_available"
+
+class BookPage(BaseModel):
+    items: List[BookInfo]
+    next_cursor: Optional[str] = None  # Pass as `after` to fetch the next page
+
 class BorrowRequestInput(BaseModel):
     user_id: int
 
@@ -240,17 +328,26 @@ class AuthUser(BaseModel):
 
 class RecentActivity(BaseModel):
     id: str
-    type: str  # 'borrow', 'donation', 'return', 'member'
+    type: str  # ActivityType value, or 'admin_approve'/'admin_reject' in an admin's own feed
     description: str
     timestamp: datetime
     user_name: Optional[str] = None
     book_title: Optional[str] = None
 
+class ActivityPage(BaseModel):
+    items: List[RecentActivity]  # Newest first
+    next_cursor: Optional[str] = None  # Pass as `before` to fetch older activity
+    latest_cursor: Optional[str] = None  # Pass as `since` to fetch only newer activity
+    has_newer: bool = False  # More new activity is waiting after this page
+    # Pages leave out the last few seconds of activity (see activity.SETTLE_WINDOW)
+    # so a `since` poll never misses a late commit or repeats an event
+
 # ===== AUTHENTICATION ROUTES =====
 
-@app.post("/auth/register", response_model=AuthResponse, tags=["auth"])
-def register_user(user_data: UserRegistration, db: Session = Depends(get_db)):
-    """Register a new user"""
+# Passwords are hashed on the dedicated pool in security.py, so the auth
+# endpoints are async and keep their database work off the event loop
+
+def check_registration(db: Session, user_data: UserRegistration):
     # Check if email already exists
     existing_user = db.exec(select(User).where(User.email == user_data.email)).first()
     if existing_user:
@@ -262,6 +359,15 @@ def register_user(user_data: UserRegistration, db: Session = Depends(get_db)):
         if existing_phone:
             raise HTTPException(400, detail="Phone number already registered")
 
+def precheck_registration(db: Session, user_data: UserRegistration):
+    check_registration(db, user_data)
+    # Give the connection back to the pool rather than hold it during the hash
+    db.rollback()
+
+def create_member(db: Session, user_data: UserRegistration, password_hash: str) -> AuthResponse:
+    # Check again: someone may have registered the same email or phone while the password was hashed
+    check_registration(db, user_data)
+
     # Get the USER role
     user_role = db.exec(select(Role).where(Role.id == 3)).first()  # Regular user role
     if not user_role:
@@ -272,10 +378,26 @@ def register_user(user_data: UserRegistration, db: Session = Depends(get_db)):
         name=user_data.name,
         email=user_data.email,
         phone=user_data.phone,
-        password=get_password_hash(user_data.password),
+        password=password_hash,
         role_id=user_role.id
     )
     db.add(new_user)
+    try:
+        db.flush()
+    except IntegrityError:
+        # Lost a race with a concurrent sign-up for the same email
+        db.rollback()
+        raise HTTPException(400, detail="Email already registered")
+    # Active broadcast announcements start out unread for new members too
+    db.add(NotificationState(
+        user_id=new_user.id,
+        unread_count=db.exec(
+            select(func.count(Announcement.id)).where(Announcement.is_active == True, Announcement.is_broadcast == True)
+        ).one()
+    ))
+    db.flush()
+    record_activity(db, ActivityType.MEMBER, new_user, created_at=new_user.created_at)
+    notify(db, new_user.id, NotificationType.WELCOME, welcome_message(new_user), created_at=new_user.created_at)
     db.commit()
     db.refresh(new_user)
 
@@ -301,21 +423,30 @@ def register_user(user_data: UserRegistration, db: Session = Depends(get_db)):
         expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
     )
 
+@app.post("/auth/register", response_model=AuthResponse, tags=["auth"])
+async def register_user(user_data: UserRegistration, db: Session = Depends(get_db)):
+    """Register a new user"""
+    await run_in_threadpool(precheck_registration, db, user_data)
+    password_hash = await hash_password(user_data.password)
+    return await run_in_threadpool(create_member, db, user_data, password_hash)
+
 @app.post("/auth/login", response_model=AuthResponse, tags=["auth"])
-def login_user(login_data: UserLogin, db: Session = Depends(get_db)):
+async def login_user(login_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """Login user with email and password"""
     # Find user by email
-    user_with_role = db.exec(
+    user_with_role = (await db.exec(
         select(User, Role).join(Role, User.role_id == Role.id).where(User.email == login_data.email)
-    ).first()
+    )).first()
     
     if not user_with_role:
         raise HTTPException(401, detail="Invalid email or password")
     
     user_obj, role_obj = user_with_role
+    # Give the connection back to the pool rather than hold it during the hash
+    await db.close()
     
     # Verify password
-    if not verify_password(login_data.password, user_obj.password):
+    if not await check_password(login_data.password, user_obj.password):
         raise HTTPException(401, detail="Invalid email or password")
     
     # Create access token
@@ -398,53 +529,216 @@ def get_users(db: Session = Depends(get_db)):
         ))
     return result
 
+def get_blocked_book_ids(db: Session, user_id: int) -> set:
+    """Get IDs of books the user currently holds or has a pending request for"""
+    rows = db.exec(
+        select(BookCopy.book_id).join(
+            BorrowTransaction, BorrowTransaction.book_copy_id == BookCopy.id
+        ).where(
+            (BorrowTransaction.user_id == user_id) &
+            (
+                ((BorrowTransaction.status == TransactionStatus.SUCCESS) &
+                 (BorrowTransaction.return_date == None)) |
+                (BorrowTransaction.status == TransactionStatus.PENDING)
+            )
+        ).distinct()
+    ).all()
+    return set(rows)
+
+def encode_cursor(*values) -> str:
+    """Encode keyset values into an opaque cursor string"""
+    raw = json.dumps(values, ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, *types: type) -> list:
+    """Decode a cursor produced by encode_cursor, checking each value's type"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except ValueError:
+        raise HTTPException(400, detail="Invalid cursor.")
+    if not isinstance(values, list) or len(values) != len(types):
+        raise HTTPException(400, detail="Invalid cursor.")
+    for value, expected in zip(values, types):
+        # JSON true/false decode to bool, which is a subclass of int
+        if not isinstance(value, expected) or isinstance(value, bool):
+            raise HTTPException(400, detail="Invalid cursor.")
+    return values
+
+def decode_activity_cursors(before: Optional[str], since: Optional[str]):
+    """Decode the `before` and `since` activity cursors into keyset tuples"""
+    if before and since:
+        raise HTTPException(400, detail="Use either before or since, not both.")
+    keys = []
+    for cursor in (before, since):
+        if not cursor:
+            keys.append(None)
+            continue
+        timestamp, event_id = decode_cursor(cursor, str, int)
+        try:
+            keys.append((datetime.fromisoformat(timestamp), int(event_id)))
+        except (TypeError, ValueError):
+            raise HTTPException(400, detail="Invalid cursor.")
+    return keys
+
+def make_activity_page(events: list, limit: int, since: Optional[str], since_key, viewer_id: Optional[int] = None):
+    """Build an ActivityPage from a feed fetched with limit + 1 events"""
+    has_more = len(events) > limit
+    if since_key is not None:
+        # Catching up returns the oldest new events, so the extra one is the newest
+        events = events[-limit:]
+    else:
+        events = events[:limit]
+
+    def cursor(event):
+        return encode_cursor(event.created_at.isoformat(), event.id)
+
+    return ActivityPage(
+        items=[RecentActivity(**describe_activity(event, viewer_id)) for event in events],
+        next_cursor=cursor(events[-1]) if has_more and since_key is None else None,
+        latest_cursor=cursor(events[0]) if events else since,
+        has_newer=has_more and since_key is not None,
+    )
+
+def build_catalog_query(category: Optional[str] = None, author: Optional[str] = None, available_only: bool = False):
+    """Build the catalog query with optional filters"""
+    query = select(Book)
+    if category:
+        query = query.where(Book.category == category)
+    if author:
+        query = query.where(Book.author == author)
+    if available_only:
+        query = query.where(Book.available_copies > 0)
+    return query
+
+def make_book_info(book: Book, blocked_book_ids: set) -> BookInfo:
+    return BookInfo(
+        id=book.id,
+        title=book.title,
+        author=book.author,
+        category=book.category,
+        available_copies=book.available_copies,
+        description=book.description,
+        isbn=book.isbn,
+        cover_img=book.cover_img,
+        user_can_borrow=book.id not in blocked_book_ids
+    )
+
 @app.get("/books/", response_model=List[BookInfo], tags=["public"])
-def get_books(user_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
+def get_books(
+    request: Request,
+    user_id: Optional[int] = Query(None),
+    etag: str = conditional_get("books", "transactions"),
+    db: Session = Depends(get_db)
+):
     """Get all books with availability info for a specific user"""
-    books = db.exec(select(Book)).all()
-    data = []
-    for book in books:
-        available_copies = db.exec(
-            select(BookCopy).where((BookCopy.book_id == book.id) & (BookCopy.status == BookStatus.AVAILABLE))
-        ).all()
-        
-        # Check if user can borrow this book (doesn't already have a copy or pending request)
-        user_can_borrow = True
-        if user_id:
-            # Check if user currently has this book borrowed
-            current_borrow = db.exec(
-                select(BorrowTransaction).join(BookCopy).where(
-                    (BorrowTransaction.user_id == user_id) &
-                    (BookCopy.book_id == book.id) &
-                    (BorrowTransaction.status == TransactionStatus.SUCCESS) &
-                    (BorrowTransaction.return_date == None)
-                )
-            ).first()
-            
-            # Check if user has pending request for this book
-            pending_request = db.exec(
-                select(BorrowTransaction).join(BookCopy).where(
-                    (BorrowTransaction.user_id == user_id) &
-                    (BookCopy.book_id == book.id) &
-                    (BorrowTransaction.status == TransactionStatus.PENDING)
-                )
-            ).first()
-            
-            if current_borrow or pending_request:
-                user_can_borrow = False
-        
-        data.append(BookInfo(
-            id=book.id, 
-            title=book.title, 
-            author=book.author,
-            category=book.category, 
-            available_copies=len(available_copies),
-            description=book.description,
-            isbn=book.isbn,
-            cover_img=book.cover_img,
-            user_can_borrow=user_can_borrow
-        ))
-    return data
+    key = cache_key(request)
+    cached = response_cache.get(key, etag)
+    if cached is not None:
+        return cached
+
+    books = db.exec(build_catalog_query().order_by(Book.id)).all()
+
+    # User can't borrow books they already hold or have a pending request for
+    blocked_book_ids = get_blocked_book_ids(db, user_id) if user_id else set()
+
+    return response_cache.set(key, etag, [make_book_info(book, blocked_book_ids) for book in books])
+
+@app.get("/books/page", response_model=BookPage, tags=["public"],
+         dependencies=[conditional_get("books", "transactions")])
+def get_book_page(
+    user_id: Optional[int] = Query(None),
+    category: Optional[str] = Query(None),
+    author: Optional[str] = Query(None),
+    available_only: bool = Query(False),
+    sort: BookSort = Query(BookSort.TITLE),
+    after: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Get one page of the catalog using keyset pagination"""
+    query = build_catalog_query(category, author, available_only)
+
+    # Every sort order ends with Book.id so the keyset is unique and stable
+    if sort == BookSort.TITLE:
+        query = query.order_by(Book.title, Book.id)
+        if after:
+            title, book_id = decode_cursor(after, str, int)
+            query = query.where((Book.title > title) | ((Book.title == title) & (Book.id > book_id)))
+    elif sort == BookSort.NEWEST:
+        query = query.order_by(Book.id.desc())
+        if after:
+            (book_id,) = decode_cursor(after, int)
+            query = query.where(Book.id < book_id)
+    else:
+        query = query.order_by(Book.available_copies.desc(), Book.id)
+        if after:
+            count, book_id = decode_cursor(after, int, int)
+            query = query.where(
+                (Book.available_copies < count) |
+                ((Book.available_copies == count) & (Book.id > book_id))
+            )
+
+    # Fetch one extra row to know whether another page exists
+    rows = db.exec(query.limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last_book = rows[-1]
+        if sort == BookSort.TITLE:
+            next_cursor = encode_cursor(last_book.title, last_book.id)
+        elif sort == BookSort.NEWEST:
+            next_cursor = encode_cursor(last_book.id)
+        else:
+            next_cursor = encode_cursor(last_book.available_copies, last_book.id)
+
+    blocked_book_ids = get_blocked_book_ids(db, user_id) if user_id else set()
+
+    return BookPage(
+        items=[make_book_info(book, blocked_book_ids) for book in rows],
+        next_cursor=next_cursor
+    )
+
+@app.get("/books/search", response_model=List[BookInfo], tags=["public"])
+def search_books(
+    q: str = Query(..., min_length=1),
+    user_id: Optional[int] = Query(None),
+    fuzzy: bool = Query(False),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Search books by title, author and description, best match first.
+
+    With fuzzy=true, titles and authors are matched by character n-grams so
+    misspellings and half-typed words still find the book.
+    """
+    if fuzzy:
+        # Pick up books added by other workers before searching
+        book_index.refresh(db)
+        book_ids = book_index.search(q, limit)
+    else:
+        book_ids = search_book_ids(db, q, limit)
+    if not book_ids:
+        return []
+
+    books = db.exec(build_catalog_query().where(Book.id.in_(book_ids))).all()
+    blocked_book_ids = get_blocked_book_ids(db, user_id) if user_id else set()
+
+    # Restore relevance order from the search index
+    rank = {book_id: position for position, book_id in enumerate(book_ids)}
+    books = sorted(books, key=lambda book: rank[book.id])
+    return [make_book_info(book, blocked_book_ids) for book in books]
+
+@app.get("/books/suggest", response_model=List[Suggestion], tags=["public"])
+def suggest_books(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=20)):
+    """Autocomplete titles, authors and categories, most borrowed first"""
+    # Served from memory; the database is only read every few minutes
+    if suggestion_index.needs_refresh():
+        with Session(engine) as session:
+            suggestion_index.refresh(session)
+    return suggestion_index.suggest(q, limit)
 
 @app.post("/borrow/{book_id}", tags=["public"])
 def request_borrow(book_id: int, req: BorrowRequestInput, db: Session = Depends(get_db)):
@@ -498,6 +792,8 @@ def request_borrow(book_id: int, req: BorrowRequestInput, db: Session = Depends(
         status=TransactionStatus.PENDING
     )
     db.add(txn)
+    db.flush()
+    record_activity(db, ActivityType.BORROW_REQUEST, user, book, txn.id, created_at=txn.created_at)
     db.commit()
     db.refresh(txn)
     return {"message": "Borrow request submitted", "borrow_txn_id": txn.id, "copy_id": copy.id}
@@ -526,6 +822,7 @@ def create_book_donation(book_data: BookDonationInput, current_user_id: int = De
     )
     db.add(new_book)
     db.flush()  # Flush to get the book ID
+    index_book(db, new_book)
     
     # Create donation transaction
     txn = DonationTransaction(
@@ -534,9 +831,13 @@ def create_book_donation(book_data: BookDonationInput, current_user_id: int = De
         status=TransactionStatus.PENDING
     )
     db.add(txn)
+    db.flush()
+    record_activity(db, ActivityType.DONATION_REQUEST, user, new_book, txn.id, created_at=txn.created_at)
     db.commit()
     db.refresh(new_book)
     db.refresh(txn)
+    book_index.add(new_book.id, new_book.title, new_book.author)
+    suggestion_index.add_book(new_book.id, new_book.title, new_book.author, new_book.category)
     
     return {
         "message": "Book donation submitted successfully", 
@@ -560,6 +861,8 @@ def request_donation(book_id: int, req: DonationRequestInput, db: Session = Depe
         user_id=req.user_id, book_id=book_id, status=TransactionStatus.PENDING
     )
     db.add(txn)
+    db.flush()
+    record_activity(db, ActivityType.DONATION_REQUEST, user, book, txn.id, created_at=txn.created_at)
     db.commit()
     db.refresh(txn)
     return {"message": "Donation request submitted", "donation_txn_id": txn.id}
@@ -593,13 +896,28 @@ def return_book(*, user_id: int = Query(...), book_copy_id: Optional[int] = Quer
     
     book_copy: BookCopy = db.get(BookCopy, txn.book_copy_id)
     txn.return_date = datetime.now()
-    book_copy.status = BookStatus.AVAILABLE
+    set_copy_status(db, book_copy, BookStatus.AVAILABLE)
     book_copy.current_holder_id = None
     db.add(txn)
     db.add(book_copy)
+    record_activity(
+        db, ActivityType.RETURN, user, db.get(Book, book_copy.book_id), txn.id, created_at=txn.return_date
+    )
     db.commit()
     return {"message": f"Book copy {book_copy.id} returned.", "book_copy_id": book_copy.id}
 
+def make_current_loan(txn: BorrowTransaction, copy: BookCopy, book: Book, now: datetime) -> dict:
+    return {
+        "book_copy_id": copy.id,
+        "book_id": book.id,
+        "title": book.title,
+        "author": book.author,
+        "category": book.category,
+        "borrowed_date": txn.created_at,
+        "due_date": txn.due_date,
+        "is_overdue": now > txn.due_date
+    }
+
 # NEW ROUTE: Get user's borrowed books for easy return
 @app.get("/users/{user_id}/borrowed-books", tags=["public"])
 def get_user_borrowed_books(user_id: int, db: Session = Depends(get_db)):
@@ -621,20 +939,8 @@ def get_user_borrowed_books(user_id: int, db: Session = Depends(get_db)):
         )
     ).all()
     
-    result = []
-    for txn, copy, book in borrowed_books:
-        result.append({
-            "book_copy_id": copy.id,
-            "book_id": book.id,
-            "title": book.title,
-            "author": book.author,
-            "category": book.category,
-            "borrowed_date": txn.created_at,
-            "due_date": txn.due_date,
-            "is_overdue": datetime.now() > txn.due_date
-        })
-    
-    return result
+    now = datetime.now()
+    return [make_current_loan(txn, copy, book, now) for txn, copy, book in borrowed_books]
 
 # NEW ROUTE: Get user's recent activities
 @app.get("/users/{user_id}/recent-activities", response_model=List[RecentActivity], tags=["public"])
@@ -648,192 +954,33 @@ def get_user_recent_activities(user_id: int, limit: int = Query(10, le=50), days
     if not user_with_role:
         raise HTTPException(404, detail="User not found.")
     
-    user, role = user_with_role
-    user.role = role  # Manually set the role relationship
-    
-    activities = []
-    
-    # Calculate the cutoff date
-    cutoff_date = datetime.now() - timedelta(days=days)
-    
-    # Get recent borrow transactions for this user (both successful and pending)
-    recent_borrows = db.exec(
-        select(BorrowTransaction, BookCopy, Book).join(
-            BookCopy, BorrowTransaction.book_copy_id == BookCopy.id
-        ).join(
-            Book, BookCopy.book_id == Book.id
-        ).where(
-            (BorrowTransaction.user_id == user_id) &
-            ((BorrowTransaction.created_at >= cutoff_date) |
-             (BorrowTransaction.updated_at >= cutoff_date))
-        ).order_by(BorrowTransaction.created_at.desc()).limit(limit)
-    ).all()
-    
-    for txn, copy, book in recent_borrows:
-        if txn.status == TransactionStatus.SUCCESS:
-            activities.append(RecentActivity(
-                id=f"borrow_{txn.id}",
-                type="borrow",
-                description=f"আপনি ধার নিয়েছেন \"{book.title}\"",
-                timestamp=txn.updated_at or txn.created_at,
-                user_name=user.name,
-                book_title=book.title
-            ))
-        elif txn.status == TransactionStatus.PENDING:
-            activities.append(RecentActivity(
-                id=f"borrow_request_{txn.id}",
-                type="borrow_request",
-                description=f"আপনি ধার নেওয়ার অনুরোধ করেছেন \"{book.title}\"",
-                timestamp=txn.created_at,
-                user_name=user.name,
-                book_title=book.title
-            ))
-        elif txn.status == TransactionStatus.FAILED:
-            activities.append(RecentActivity(
-                id=f"borrow_rejected_{txn.id}",
-                type="borrow_rejected",
-                description=f"আপনার ধার নেওয়ার অনুরোধ প্রত্যাখ্যান করা হয়েছে \"{book.title}\"",
-                timestamp=txn.updated_at or txn.created_at,
-                user_name=user.name,
-                book_title=book.title
-            ))
-    
-    # Get recent donation transactions for this user (both successful and pending)
-    recent_donations = db.exec(
-        select(DonationTransaction, Book).join(
-            Book, DonationTransaction.book_id == Book.id
-        ).where(
-            (DonationTransaction.user_id == user_id) &
-            ((DonationTransaction.created_at >= cutoff_date) |
-             (DonationTransaction.updated_at >= cutoff_date))
-        ).order_by(DonationTransaction.created_at.desc()).limit(limit)
-    ).all()
-    
-    for txn, book in recent_donations:
-        if txn.status == TransactionStatus.SUCCESS:
-            activities.append(RecentActivity(
-                id=f"donation_{txn.id}",
-                type="donation",
-                description=f"আপনি দান করেছেন \"{book.title}\"",
-                timestamp=txn.updated_at or txn.created_at,
-                user_name=user.name,
-                book_title=book.title
-            ))
-        elif txn.status == TransactionStatus.PENDING:
-            activities.append(RecentActivity(
-                id=f"donation_request_{txn.id}",
-                type="donation_request",
-                description=f"আপনি দান করার অনুরোধ করেছেন \"{book.title}\"",
-                timestamp=txn.created_at,
-                user_name=user.name,
-                book_title=book.title
-            ))
-        elif txn.status == TransactionStatus.FAILED:
-            activities.append(RecentActivity(
-                id=f"donation_rejected_{txn.id}",
-                type="donation_rejected",
-                description=f"আপনার দান করার অনুরোধ প্রত্যাখ্যান করা হয়েছে \"{book.title}\"",
-                timestamp=txn.updated_at or txn.created_at,
-                user_name=user.name,
-                book_title=book.title
-            ))
-    
-    # Get recent returns for this user (transactions with return_date in the past X days)
-    recent_returns = db.exec(
-        select(BorrowTransaction, BookCopy, Book).join(
-            BookCopy, BorrowTransaction.book_copy_id == BookCopy.id
-        ).join(
-            Book, BookCopy.book_id == Book.id
-        ).where(
-            (BorrowTransaction.user_id == user_id) &
-            (BorrowTransaction.return_date.isnot(None)) &
-            (BorrowTransaction.return_date >= cutoff_date)
-        ).order_by(BorrowTransaction.return_date.desc()).limit(limit)
-    ).all()
-    
-    for txn, copy, book in recent_returns:
-        activities.append(RecentActivity(
-            id=f"return_{txn.id}",
-            type="return", 
-            description=f"আপনি ফেরত দিয়েছেন \"{book.title}\"",
-            timestamp=txn.return_date,
-            user_name=user.name,
-            book_title=book.title
-        ))
-    
-    # Get admin activities if the user is an admin (transactions where this user was the admin)
-    if user.role and user.role.role_name == RoleType.ADMIN:
-        # Get recent borrow approvals/rejections
-        admin_borrow_actions = db.exec(
-            select(BorrowTransaction, User, BookCopy, Book).join(
-                User, BorrowTransaction.user_id == User.id
-            ).join(
-                BookCopy, BorrowTransaction.book_copy_id == BookCopy.id
-            ).join(
-                Book, BookCopy.book_id == Book.id
-            ).where(
-                (BorrowTransaction.admin_id == user_id) &
-                (BorrowTransaction.status.in_([TransactionStatus.SUCCESS, TransactionStatus.FAILED])) &
-                ((BorrowTransaction.updated_at >= cutoff_date))
-            ).order_by(BorrowTransaction.updated_at.desc()).limit(limit)
-        ).all()
-        
-        for txn, borrower, copy, book in admin_borrow_actions:
-            if txn.status == TransactionStatus.SUCCESS:
-                activities.append(RecentActivity(
-                    id=f"admin_approve_borrow_{txn.id}",
-                    type="admin_approve",
-                    description=f"আপনি অনুমোদন করেছেন {borrower.name} এর ধার নেওয়ার অনুরোধ \"{book.title}\"",
-                    timestamp=txn.updated_at,
-                    user_name=borrower.name,
-                    book_title=book.title
-                ))
-            elif txn.status == TransactionStatus.FAILED:
-                activities.append(RecentActivity(
-                    id=f"admin_reject_borrow_{txn.id}",
-                    type="admin_reject",
-                    description=f"আপনি প্রত্যাখ্যান করেছেন {borrower.name} এর ধার নেওয়ার অনুরোধ \"{book.title}\"",
-                    timestamp=txn.updated_at,
-                    user_name=borrower.name,
-                    book_title=book.title
-                ))
-        
-        # Get recent donation approvals/rejections
-        admin_donation_actions = db.exec(
-            select(DonationTransaction, User, Book).join(
-                User, DonationTransaction.user_id == User.id
-            ).join(
-                Book, DonationTransaction.book_id == Book.id
-            ).where(
-                (DonationTransaction.admin_id == user_id) &
-                (DonationTransaction.status.in_([TransactionStatus.SUCCESS, TransactionStatus.FAILED])) &
-                ((DonationTransaction.updated_at >= cutoff_date))
-            ).order_by(DonationTransaction.updated_at.desc()).limit(limit)
-        ).all()
-        
-        for txn, donor, book in admin_donation_actions:
-            if txn.status == TransactionStatus.SUCCESS:
-                activities.append(RecentActivity(
-                    id=f"admin_approve_donation_{txn.id}",
-                    type="admin_approve",
-                    description=f"আপনি অনুমোদন করেছেন {donor.name} এর দান করার অনুরোধ \"{book.title}\"",
-                    timestamp=txn.updated_at,
-                    user_name=donor.name,
-                    book_title=book.title
-                ))
-            elif txn.status == TransactionStatus.FAILED:
-                activities.append(RecentActivity(
-                    id=f"admin_reject_donation_{txn.id}",
-                    type="admin_reject",
-                    description=f"আপনি প্রত্যাখ্যান করেছেন {donor.name} এর দান করার অনুরোধ \"{book.title}\"",
-                    timestamp=txn.updated_at,
-                    user_name=donor.name,
-                    book_title=book.title
-                ))
-
-    # Sort all activities by timestamp and return limited results
-    activities.sort(key=lambda x: x.timestamp, reverse=True)
-    return activities[:limit]
+    _, role = user_with_role
+    return user_recent_activities(db, user_id, role, limit, days)
+
+def user_recent_activities(db: Session, user_id: int, role: Optional[Role], limit: int, days: int) -> List[RecentActivity]:
+    is_admin = role is not None and role.role_name == RoleType.ADMIN
+    events = user_feed(db, user_id, limit, is_admin, newer_than=datetime.now() - timedelta(days=days))
+    return [RecentActivity(**describe_activity(event, viewer_id=user_id)) for event in events]
+
+@app.get("/users/{user_id}/recent-activities/page", response_model=ActivityPage, tags=["public"])
+def get_user_activity_page(
+    user_id: int,
+    before: Optional[str] = Query(None),
+    since: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """Page back through a user's activity, or fetch only what is newer than `since`"""
+    role = db.exec(
+        select(Role).join(User, User.role_id == Role.id).where(User.id == user_id)
+    ).first()
+    if role is None and db.get(User, user_id) is None:
+        raise HTTPException(404, detail="User not found.")
+
+    is_admin = role is not None and role.role_name == RoleType.ADMIN
+    before_key, since_key = decode_activity_cursors(before, since)
+    events = user_feed(db, user_id, limit + 1, is_admin, before=before_key, since=since_key, settled=True)
+    return make_activity_page(events, limit, since, since_key, viewer_id=user_id)
 
 # ========== ADMIN ROUTES ==========
 
@@ -863,8 +1010,7 @@ class AdminDonationRequest(BaseModel):
     user: UserInfo
     book: BookInfo
 
-@app.get("/admin/borrow-requests/", response_model=List[AdminBorrowRequest], tags=["admin"])
-def list_pending_borrow(db: Session = Depends(get_db)):
+def pending_borrow_requests(db: Session) -> List[AdminBorrowRequest]:
     txs = db.exec(
         select(BorrowTransaction, BookCopy, Book, User, Role).join(
             BookCopy, BorrowTransaction.book_copy_id == BookCopy.id
@@ -879,14 +1025,6 @@ def list_pending_borrow(db: Session = Depends(get_db)):
     
     result = []
     for txn, copy, book, user, role in txs:
-        # Count available copies for the book
-        available_copies = db.exec(
-            select(BookCopy).where(
-                (BookCopy.book_id == book.id) & 
-                (BookCopy.status == BookStatus.AVAILABLE)
-            )
-        ).all()
-        
         result.append(AdminBorrowRequest(
             id=txn.id,
             user_id=txn.user_id,
@@ -909,7 +1047,7 @@ def list_pending_borrow(db: Session = Depends(get_db)):
                 title=book.title,
                 author=book.author,
                 category=book.category,
-                available_copies=len(available_copies),
+                available_copies=book.available_copies,
                 description=book.description,
                 isbn=book.isbn,
                 cover_img=book.cover_img,
@@ -918,8 +1056,11 @@ def list_pending_borrow(db: Session = Depends(get_db)):
         ))
     return result
 
-@app.get("/admin/donation-requests/", response_model=List[AdminDonationRequest], tags=["admin"])
-def list_pending_donations(db: Session = Depends(get_db)):
+@app.get("/admin/borrow-requests/", response_model=List[AdminBorrowRequest], tags=["admin"])
+def list_pending_borrow(db: Session = Depends(get_db)):
+    return pending_borrow_requests(db)
+
+def pending_donation_requests(db: Session) -> List[AdminDonationRequest]:
     txs = db.exec(
         select(DonationTransaction, Book, User, Role).join(
             Book, DonationTransaction.book_id == Book.id
@@ -932,14 +1073,6 @@ def list_pending_donations(db: Session = Depends(get_db)):
     
     result = []
     for txn, book, user, role in txs:
-        # Count available copies for the book
-        available_copies = db.exec(
-            select(BookCopy).where(
-                (BookCopy.book_id == book.id) & 
-                (BookCopy.status == BookStatus.AVAILABLE)
-            )
-        ).all()
-        
         result.append(AdminDonationRequest(
             id=txn.id,
             user_id=txn.user_id,
@@ -961,7 +1094,7 @@ def list_pending_donations(db: Session = Depends(get_db)):
                 title=book.title,
                 author=book.author,
                 category=book.category,
-                available_copies=len(available_copies),
+                available_copies=book.available_copies,
                 description=book.description,
                 isbn=book.isbn,
                 cover_img=book.cover_img,
@@ -970,6 +1103,10 @@ def list_pending_donations(db: Session = Depends(get_db)):
         ))
     return result
 
+@app.get("/admin/donation-requests/", response_model=List[AdminDonationRequest], tags=["admin"])
+def list_pending_donations(db: Session = Depends(get_db)):
+    return pending_donation_requests(db)
+
 @app.post("/admin/borrow-requests/{tx_id}/approve", tags=["admin"])
 def approve_borrow(tx_id: int, input: AdminActionInput, db: Session = Depends(get_db)):
     # Check if admin exists
@@ -989,11 +1126,20 @@ def approve_borrow(tx_id: int, input: AdminActionInput, db: Session = Depends(ge
     tx.admin_id = input.admin_id
     tx.admin_comment = input.comment
     tx.updated_at = datetime.now()
-    book_copy.status = BookStatus.BORROWED
+    set_copy_status(db, book_copy, BookStatus.BORROWED)
     book_copy.current_holder_id = tx.user_id
     
     db.add(tx)
     db.add(book_copy)
+    book = db.get(Book, book_copy.book_id)
+    record_activity(
+        db, ActivityType.BORROW, db.get(User, tx.user_id), book,
+        tx.id, admin_id=input.admin_id, created_at=tx.updated_at
+    )
+    notify(
+        db, tx.user_id, NotificationType.BORROW_APPROVED,
+        handled_message(NotificationType.BORROW_APPROVED, book.title), tx.id, tx.updated_at
+    )
     db.commit()
     return {"message": "Borrow request approved."}
 
@@ -1013,6 +1159,16 @@ def reject_borrow(tx_id: int, input: AdminActionInput, db: Session = Depends(get
     tx.admin_comment = input.comment
     tx.updated_at = datetime.now()
     db.add(tx)
+    book_copy = db.get(BookCopy, tx.book_copy_id)
+    book = db.get(Book, book_copy.book_id)
+    record_activity(
+        db, ActivityType.BORROW_REJECTED, db.get(User, tx.user_id), book,
+        tx.id, admin_id=input.admin_id, created_at=tx.updated_at
+    )
+    notify(
+        db, tx.user_id, NotificationType.BORROW_REJECTED,
+        handled_message(NotificationType.BORROW_REJECTED, book.title, tx.admin_comment), tx.id, tx.updated_at
+    )
     db.commit()
     return {"message": "Borrow request rejected."}
 
@@ -1035,7 +1191,16 @@ def approve_donation(tx_id: int, input: AdminActionInput, db: Session = Depends(
     # Add new physical copy to library
     new_copy = BookCopy(book_id=tx.book_id, status=BookStatus.AVAILABLE)
     db.add(tx)
-    db.add(new_copy)
+    add_copy(db, new_copy)
+    book = db.get(Book, tx.book_id)
+    record_activity(
+        db, ActivityType.DONATION, db.get(User, tx.user_id), book,
+        tx.id, admin_id=input.admin_id, created_at=tx.updated_at
+    )
+    notify(
+        db, tx.user_id, NotificationType.DONATION_APPROVED,
+        handled_message(NotificationType.DONATION_APPROVED, book.title), tx.id, tx.updated_at
+    )
     db.commit()
     return {"message": "Donation approved and new copy added."}
 
@@ -1055,405 +1220,392 @@ def reject_donation(tx_id: int, input: AdminActionInput, db: Session = Depends(g
     tx.admin_comment = input.comment
     tx.updated_at = datetime.now()
     db.add(tx)
+    book = db.get(Book, tx.book_id)
+    record_activity(
+        db, ActivityType.DONATION_REJECTED, db.get(User, tx.user_id), book,
+        tx.id, admin_id=input.admin_id, created_at=tx.updated_at
+    )
+    notify(
+        db, tx.user_id, NotificationType.DONATION_REJECTED,
+        handled_message(NotificationType.DONATION_REJECTED, book.title, tx.admin_comment), tx.id, tx.updated_at
+    )
     db.commit()
     return {"message": "Donation rejected."}
 
 @app.get("/recent-activities", response_model=List[RecentActivity], tags=["public"])
-def get_recent_activities(limit: int = Query(10, le=50), db: Session = Depends(get_db)):
+def get_recent_activities(
+    request: Request,
+    limit: int = Query(10, le=50),
+    etag: str = conditional_get("activity"),
+    db: Session = Depends(get_db)
+):
     """Get recent activities across the library"""
-    activities = []
-    
-    # Get recent successful borrow transactions
-    recent_borrows = db.exec(
-        select(BorrowTransaction, User, BookCopy, Book).join(
-            User, BorrowTransaction.user_id == User.id
-        ).join(
-            BookCopy, BorrowTransaction.book_copy_id == BookCopy.id
-        ).join(
-            Book, BookCopy.book_id == Book.id
-        ).where(
-            BorrowTransaction.status == TransactionStatus.SUCCESS
-        ).order_by(BorrowTransaction.updated_at.desc()).limit(limit // 2)
+    key = cache_key(request)
+    cached = response_cache.get(key, etag)
+    if cached is not None:
+        return cached
+
+    events = library_feed(db, limit)
+    return response_cache.set(key, etag, [RecentActivity(**describe_activity(event)) for event in events])
+
+@app.get("/recent-activities/page", response_model=ActivityPage, tags=["public"])
+def get_activity_page(
+    before: Optional[str] = Query(None),
+    since: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """Page back through library activity, or fetch only what is newer than `since`"""
+    before_key, since_key = decode_activity_cursors(before, since)
+    events = library_feed(db, limit + 1, before=before_key, since=since_key, settled=True)
+    return make_activity_page(events, limit, since, since_key)
+
+@app.get("/events/stream", tags=["public"])
+async def stream_events(
+    request: Request,
+    topics: Optional[str] = Query(None, description="Comma separated: activity, pending, handled, availability"),
+    last_event_id: Optional[int] = Query(None, description="Alternative to the Last-Event-ID header")
+):
+    """Server-Sent Events for new activity, pending requests and copy availability"""
+    header = request.headers.get("last-event-id")
+    if header:
+        try:
+            last_event_id = int(header)
+        except ValueError:
+            raise HTTPException(400, detail="Invalid Last-Event-ID.")
+
+    wanted = parse_topics(topics)
+    subscriber = await event_broker.subscribe(wanted)
+    # Subscribe first so nothing committed during the replay is missed
+    replay = await event_broker.replay(last_event_id, wanted) if last_event_id is not None else []
+    return StreamingResponse(
+        event_broker.stream(subscriber, replay),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/library/statistics", tags=["public"])
+async def get_library_statistics(request: Request, response: Response):
+    """Get overall library statistics from this worker's snapshot"""
+    counts, etag, age = await library_stats.get()
+    if etag is not None:
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+    return {**counts, "snapshot_age_seconds": round(age, 1)}
+
+MAX_TIMESERIES_DAYS = 3660
+
+@app.get("/library/statistics/timeseries", tags=["public"])
+def get_statistics_timeseries(
+    request: Request,
+    start: Optional[date] = Query(None, alias="from", description="First day, defaults to 29 days before `to`"),
+    end: Optional[date] = Query(None, alias="to", description="Last day, defaults to today"),
+    bucket: str = Query("day", description="day, week or month"),
+    # The default range ends today, so the ETag changes daily too
+    etag: str = conditional_get("activity", extra=lambda: datetime.now().strftime("%Y%m%d")),
+    db: Session = Depends(get_db)
+):
+    """Borrows, returns, donations and new members per day, week or month"""
+    if bucket not in BUCKETS:
+        raise HTTPException(400, detail="Invalid bucket. Use day, week or month.")
+    end = end or datetime.now().date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(400, detail="`from` must not be after `to`.")
+    if (end - start).days > MAX_TIMESERIES_DAYS:
+        raise HTTPException(400, detail="Date range is too long.")
+
+    key = cache_key(request)
+    cached = response_cache.get(key, etag)
+    if cached is not None:
+        return cached
+    return response_cache.set(key, etag, {
+        "from": start,
+        "to": end,
+        "bucket": bucket,
+        "points": timeseries(db, start, end, bucket)
+    })
+
+# ===== ADMIN REPORTS =====
+
+# Each report is built by a helper so /admin/dashboard can serve several of
+# them from one session and share the rows they have in common
+
+def books_with_donors(db: Session) -> list:
+    return db.exec(
+        select(Book, User).outerjoin(User, Book.donor_id == User.id).order_by(Book.id)
     ).all()
-    
-    for txn, user, copy, book in recent_borrows:
-        activities.append(RecentActivity(
-            id=f"borrow_{txn.id}",
-            type="borrow",
-            description=f"{user.name} ধার নিয়েছেন \"{book.title}\"",
-            timestamp=txn.updated_at or txn.created_at,
-            user_name=user.name,
-            book_title=book.title
-        ))
-    
-    # Get recent successful donation transactions
-    recent_donations = db.exec(
-        select(DonationTransaction, User, Book).join(
-            User, DonationTransaction.user_id == User.id
-        ).join(
-            Book, DonationTransaction.book_id == Book.id
-        ).where(
-            DonationTransaction.status == TransactionStatus.SUCCESS
-        ).order_by(DonationTransaction.updated_at.desc()).limit(limit // 2)
+
+def make_detailed_book(book: Book, donor: Optional[User]) -> dict:
+    return {
+        "id": book.id,
+        "title": book.title,
+        "author": book.author,
+        "category": book.category,
+        "isbn": book.isbn,
+        "description": book.description,
+        "cover_img": book.cover_img,
+        "donor_name": donor.name if donor else "Unknown",
+        "total_copies": book.total_copies,
+        "available_copies": book.available_copies,
+        "borrowed_copies": book.borrowed_copies
+    }
+
+def detailed_available_books(db: Session, books: list) -> List[dict]:
+    """Books with available copies, from books_with_donors rows"""
+    # Get the available copy IDs for all of those books at once
+    available_copy_ids = {}
+    available_copies = db.exec(
+        select(BookCopy.book_id, BookCopy.id).join(Book, BookCopy.book_id == Book.id).where(
+            (Book.available_copies > 0) &
+            (BookCopy.status == BookStatus.AVAILABLE)
+        ).order_by(BookCopy.id)
+    ).all()
+    for book_id, copy_id in available_copies:
+        available_copy_ids.setdefault(book_id, []).append(copy_id)
+    
+    return [
+        {**make_detailed_book(book, donor), "available_copy_ids": available_copy_ids.get(book.id, [])}
+        for book, donor in books if book.available_copies > 0
+    ]
+
+def detailed_users(db: Session) -> List[dict]:
+    # Per-member loan and donation counts, grouped once instead of queried per member
+    borrows = (
+        select(
+            BorrowTransaction.user_id,
+            func.count(BorrowTransaction.id).label("total"),
+            func.sum(case((BorrowTransaction.return_date.is_(None), 1), else_=0)).label("current"),
+        )
+        .where(BorrowTransaction.status == TransactionStatus.SUCCESS)
+        .group_by(BorrowTransaction.user_id)
+        .subquery()
+    )
+    donations = (
+        select(DonationTransaction.user_id, func.count(DonationTransaction.id).label("total"))
+        .where(DonationTransaction.status == TransactionStatus.SUCCESS)
+        .group_by(DonationTransaction.user_id)
+        .subquery()
+    )
+    users = db.exec(
+        select(
+            User, Role,
+            func.coalesce(borrows.c.total, 0),
+            func.coalesce(borrows.c.current, 0),
+            func.coalesce(donations.c.total, 0),
+        )
+        .join(Role, User.role_id == Role.id)
+        .outerjoin(borrows, borrows.c.user_id == User.id)
+        .outerjoin(donations, donations.c.user_id == User.id)
+        .order_by(User.id)
     ).all()
     
-    for txn, user, book in recent_donations:
-        activities.append(RecentActivity(
-            id=f"donation_{txn.id}",
-            type="donation",
-            description=f"{user.name} দান করেছেন \"{book.title}\"",
-            timestamp=txn.updated_at or txn.created_at,
-            user_name=user.name,
-            book_title=book.title
-        ))
+    result = []
+    week_ago = datetime.now() - timedelta(days=7)
     
-    # Get recent returns (transactions with return_date)
-    recent_returns = db.exec(
-        select(BorrowTransaction, User, BookCopy, Book).join(
-            User, BorrowTransaction.user_id == User.id
-        ).join(
+    for user, role, total_borrowed, current_borrowed, total_donated in users:
+        is_new = user.created_at > week_ago
+        is_active = current_borrowed > 0
+        
+        result.append({
+            "id": user.id,
+            "name": user.name,
+            "email": user.email,
+            "phone": user.phone,
+            "role_name": role.role_name.value,
+            "created_at": user.created_at,
+            "total_borrowed": total_borrowed,
+            "current_borrowed": current_borrowed,
+            "total_donated": total_donated,
+            "is_new": is_new,
+            "is_active": is_active
+        })
+    
+    return result
+
+def detailed_borrowed_books(db: Session) -> List[dict]:
+    borrowed_books = db.exec(
+        select(BorrowTransaction, BookCopy, Book, User).join(
             BookCopy, BorrowTransaction.book_copy_id == BookCopy.id
         ).join(
             Book, BookCopy.book_id == Book.id
+        ).join(
+            User, BorrowTransaction.user_id == User.id
         ).where(
-            BorrowTransaction.return_date.isnot(None)
-        ).order_by(BorrowTransaction.return_date.desc()).limit(limit // 4)
+            (BorrowTransaction.status == TransactionStatus.SUCCESS) &
+            (BorrowTransaction.return_date.is_(None))
+        ).order_by(BorrowTransaction.created_at.desc())
     ).all()
     
-    for txn, user, copy, book in recent_returns:
-        activities.append(RecentActivity(
-            id=f"return_{txn.id}",
-            type="return", 
-            description=f"{user.name} ফেরত দিয়েছেন \"{book.title}\"",
-            timestamp=txn.return_date,
-            user_name=user.name,
-            book_title=book.title
-        ))
+    result = []
+    for txn, copy, book, user in borrowed_books:
+        is_overdue = datetime.now() > txn.due_date
+        days_borrowed = (datetime.now() - txn.created_at).days
+        days_until_due = (txn.due_date - datetime.now()).days if not is_overdue else 0
+        
+        result.append({
+            "transaction_id": txn.id,
+            "book_copy_id": copy.id,
+            "book_title": book.title,
+            "book_author": book.author,
+            "book_category": book.category,
+            "user_name": user.name,
+            "user_email": user.email,
+            "borrowed_date": txn.created_at,
+            "due_date": txn.due_date,
+            "days_borrowed": days_borrowed,
+            "days_until_due": days_until_due,
+            "is_overdue": is_overdue
+        })
     
-    # Get recent new users
-    recent_users = db.exec(
-        select(User).order_by(User.created_at.desc()).limit(limit // 4)
+    return result
+
+def detailed_donations(db: Session) -> List[dict]:
+    donations = db.exec(
+        select(DonationTransaction, Book, User).join(
+            Book, DonationTransaction.book_id == Book.id
+        ).join(
+            User, DonationTransaction.user_id == User.id
+        ).where(
+            DonationTransaction.status == TransactionStatus.SUCCESS
+        ).order_by(DonationTransaction.updated_at.desc())
     ).all()
     
-    for user in recent_users:
-        activities.append(RecentActivity(
-            id=f"member_{user.id}",
-            type="member",
-            description=f"{user.name} নতুন সদস্য হিসেবে যোগ দিয়েছেন",
-            timestamp=user.created_at,
-            user_name=user.name
-        ))
+    result = []
+    for txn, book, user in donations:
+        result.append({
+            "transaction_id": txn.id,
+            "book_title": book.title,
+            "book_author": book.author,
+            "book_category": book.category,
+            "book_isbn": book.isbn,
+            "donor_name": user.name,
+            "donor_email": user.email,
+            "donation_date": txn.updated_at or txn.created_at,
+            "copies_added": book.total_copies,  # Every copy the book has
+            "admin_comment": txn.admin_comment
+        })
     
-    # Sort all activities by timestamp and return limited results
-    activities.sort(key=lambda x: x.timestamp, reverse=True)
-    return activities[:limit]
+    return result
 
-@app.get("/library/statistics", tags=["public"])
-async def get_library_statistics(db: Session = Depends(get_db)):
-    """Get overall library statistics"""
-    try:
-        # Get total books
-        total_books = db.exec(select(func.count(Book.id))).first()
-        
-        # Get total book copies and available copies  
-        total_copies = db.exec(select(func.count(BookCopy.id))).first() or 0
-        available_copies = db.exec(
-            select(func.count(BookCopy.id))
-            .where(BookCopy.status == BookStatus.AVAILABLE)
-        ).first() or 0
-        borrowed_books = db.exec(
-            select(func.count(BookCopy.id))
-            .where(BookCopy.status == BookStatus.BORROWED)
-        ).first() or 0
-        
-        # Get total users
-        total_users = db.exec(select(func.count(User.id))).first()
-        
-        # Get active users (users with current borrows)
-        active_users = db.exec(
-            select(func.count(func.distinct(BorrowTransaction.user_id)))
-            .where(
-                (BorrowTransaction.return_date.is_(None)) &
-                (BorrowTransaction.status == TransactionStatus.SUCCESS)
-            )
-        ).first()
-        
-        # Get new users (last 7 days)
-        week_ago = datetime.now() - timedelta(days=7)
-        new_users = db.exec(
-            select(func.count(User.id))
-            .where(User.created_at > week_ago)
-        ).first()
-        
-        # Get total approved donations
-        total_donations = db.exec(
-            select(func.count(DonationTransaction.id))
-            .where(DonationTransaction.status == TransactionStatus.SUCCESS)
-        ).first()
-        
-        return {
-            "total_books": total_books or 0,
-            "available_books": available_copies,
-            "borrowed_books": borrowed_books,
-            "total_users": total_users or 0,
-            "active_users": active_users or 0,
-            "new_users": new_users or 0,
-            "total_donations": total_donations or 0
-        }
-        
-    except Exception as e:
-        logger.error(f"Error fetching library statistics: {e}")
-        return {
-            "total_books": 0,
-            "available_books": 0,
-            "borrowed_books": 0,
-            "total_users": 0,
-            "active_users": 0,
-            "new_users": 0,
-            "total_donations": 0
-        }
+# The report endpoints are plain def on the sync session so they run in the
+# threadpool. On the async engine, run_sync would still build every ORM row on
+# the event loop, which stalls other requests longer (see bench_async_reports.py)
+
+def detailed_books(db: Session) -> List[dict]:
+    return [make_detailed_book(book, donor) for book, donor in books_with_donors(db)]
+
+def available_books_report(db: Session) -> List[dict]:
+    # Only include books that have available copies
+    books = db.exec(
+        select(Book, User).outerjoin(User, Book.donor_id == User.id)
+        .where(Book.available_copies > 0).order_by(Book.id)
+    ).all()
+    return detailed_available_books(db, books)
 
 @app.get("/admin/books/detailed", tags=["admin"])
-async def get_detailed_books(db: Session = Depends(get_db)):
+def get_detailed_books(db: Session = Depends(get_db)):
     """Get detailed book information for admin statistics"""
     try:
-        books = db.exec(
-            select(Book, User).outerjoin(User, Book.donor_id == User.id)
-        ).all()
-        
-        result = []
-        for book, donor in books:
-            # Get copies information
-            total_copies = db.exec(
-                select(func.count(BookCopy.id)).where(BookCopy.book_id == book.id)
-            ).first() or 0
-            
-            available_copies = db.exec(
-                select(func.count(BookCopy.id)).where(
-                    (BookCopy.book_id == book.id) & 
-                    (BookCopy.status == BookStatus.AVAILABLE)
-                )
-            ).first() or 0
-            
-            borrowed_copies = db.exec(
-                select(func.count(BookCopy.id)).where(
-                    (BookCopy.book_id == book.id) & 
-                    (BookCopy.status == BookStatus.BORROWED)
-                )
-            ).first() or 0
-            
-            result.append({
-                "id": book.id,
-                "title": book.title,
-                "author": book.author,
-                "category": book.category,
-                "isbn": book.isbn,
-                "description": book.description,
-                "cover_img": book.cover_img,
-                "donor_name": donor.name if donor else "Unknown",
-                "total_copies": total_copies,
-                "available_copies": available_copies,
-                "borrowed_copies": borrowed_copies
-            })
-        
-        return result
+        return detailed_books(db)
     except Exception as e:
         logger.error(f"Error fetching detailed books: {e}")
         return []
 
 @app.get("/admin/users/detailed", tags=["admin"])
-async def get_detailed_users(db: Session = Depends(get_db)):
+def get_detailed_users(db: Session = Depends(get_db)):
     """Get detailed user information for admin statistics"""
     try:
-        users = db.exec(
-            select(User, Role).join(Role, User.role_id == Role.id)
-        ).all()
-        
-        result = []
-        week_ago = datetime.now() - timedelta(days=7)
-        
-        for user, role in users:
-            # Get user's borrow count
-            total_borrowed = db.exec(
-                select(func.count(BorrowTransaction.id)).where(
-                    (BorrowTransaction.user_id == user.id) &
-                    (BorrowTransaction.status == TransactionStatus.SUCCESS)
-                )
-            ).first() or 0
-            
-            # Get user's current borrows
-            current_borrowed = db.exec(
-                select(func.count(BorrowTransaction.id)).where(
-                    (BorrowTransaction.user_id == user.id) &
-                    (BorrowTransaction.status == TransactionStatus.SUCCESS) &
-                    (BorrowTransaction.return_date.is_(None))
-                )
-            ).first() or 0
-            
-            # Get user's donations
-            total_donated = db.exec(
-                select(func.count(DonationTransaction.id)).where(
-                    (DonationTransaction.user_id == user.id) &
-                    (DonationTransaction.status == TransactionStatus.SUCCESS)
-                )
-            ).first() or 0
-            
-            is_new = user.created_at > week_ago
-            is_active = current_borrowed > 0
-            
-            result.append({
-                "id": user.id,
-                "name": user.name,
-                "email": user.email,
-                "phone": user.phone,
-                "role_name": role.role_name.value,
-                "created_at": user.created_at,
-                "total_borrowed": total_borrowed,
-                "current_borrowed": current_borrowed,
-                "total_donated": total_donated,
-                "is_new": is_new,
-                "is_active": is_active
-            })
-        
-        return result
+        return detailed_users(db)
     except Exception as e:
         logger.error(f"Error fetching detailed users: {e}")
         return []
 
 @app.get("/admin/borrowed-books/detailed", tags=["admin"])
-async def get_detailed_borrowed_books(db: Session = Depends(get_db)):
+def get_detailed_borrowed_books(db: Session = Depends(get_db)):
     """Get detailed information about currently borrowed books"""
     try:
-        borrowed_books = db.exec(
-            select(BorrowTransaction, BookCopy, Book, User).join(
-                BookCopy, BorrowTransaction.book_copy_id == BookCopy.id
-            ).join(
-                Book, BookCopy.book_id == Book.id
-            ).join(
-                User, BorrowTransaction.user_id == User.id
-            ).where(
-                (BorrowTransaction.status == TransactionStatus.SUCCESS) &
-                (BorrowTransaction.return_date.is_(None))
-            ).order_by(BorrowTransaction.created_at.desc())
-        ).all()
-        
-        result = []
-        for txn, copy, book, user in borrowed_books:
-            is_overdue = datetime.now() > txn.due_date
-            days_borrowed = (datetime.now() - txn.created_at).days
-            days_until_due = (txn.due_date - datetime.now()).days if not is_overdue else 0
-            
-            result.append({
-                "transaction_id": txn.id,
-                "book_copy_id": copy.id,
-                "book_title": book.title,
-                "book_author": book.author,
-                "book_category": book.category,
-                "user_name": user.name,
-                "user_email": user.email,
-                "borrowed_date": txn.created_at,
-                "due_date": txn.due_date,
-                "days_borrowed": days_borrowed,
-                "days_until_due": days_until_due,
-                "is_overdue": is_overdue
-            })
-        
-        return result
+        return detailed_borrowed_books(db)
     except Exception as e:
         logger.error(f"Error fetching detailed borrowed books: {e}")
         return []
 
 @app.get("/admin/donations/detailed", tags=["admin"])
-async def get_detailed_donations(db: Session = Depends(get_db)):
+def get_detailed_donations(db: Session = Depends(get_db)):
     """Get detailed information about donations"""
     try:
-        donations = db.exec(
-            select(DonationTransaction, Book, User).join(
-                Book, DonationTransaction.book_id == Book.id
-            ).join(
-                User, DonationTransaction.user_id == User.id
-            ).where(
-                DonationTransaction.status == TransactionStatus.SUCCESS
-            ).order_by(DonationTransaction.updated_at.desc())
-        ).all()
-        
-        result = []
-        for txn, book, user in donations:
-            # Count copies added for this book
-            copies_count = db.exec(
-                select(func.count(BookCopy.id)).where(BookCopy.book_id == book.id)
-            ).first() or 0
-            
-            result.append({
-                "transaction_id": txn.id,
-                "book_title": book.title,
-                "book_author": book.author,
-                "book_category": book.category,
-                "book_isbn": book.isbn,
-                "donor_name": user.name,
-                "donor_email": user.email,
-                "donation_date": txn.updated_at or txn.created_at,
-                "copies_added": copies_count,
-                "admin_comment": txn.admin_comment
-            })
-        
-        return result
+        return detailed_donations(db)
     except Exception as e:
         logger.error(f"Error fetching detailed donations: {e}")
         return []
 
 @app.get("/admin/available-books/detailed", tags=["admin"])
-async def get_detailed_available_books(db: Session = Depends(get_db)):
+def get_detailed_available_books(db: Session = Depends(get_db)):
     """Get detailed information about available books"""
     try:
-        # Get all books with their available copies
-        books = db.exec(
-            select(Book, User).outerjoin(User, Book.donor_id == User.id)
-        ).all()
-        
-        result = []
-        for book, donor in books:
-            # Get available copies for this book
-            available_copies = db.exec(
-                select(BookCopy).where(
-                    (BookCopy.book_id == book.id) & 
-                    (BookCopy.status == BookStatus.AVAILABLE)
-                )
-            ).all()
-            
-            # Only include books that have available copies
-            if len(available_copies) > 0:
-                total_copies = db.exec(
-                    select(func.count(BookCopy.id)).where(BookCopy.book_id == book.id)
-                ).first() or 0
-                
-                borrowed_copies = db.exec(
-                    select(func.count(BookCopy.id)).where(
-                        (BookCopy.book_id == book.id) & 
-                        (BookCopy.status == BookStatus.BORROWED)
-                    )
-                ).first() or 0
-                
-                result.append({
-                    "id": book.id,
-                    "title": book.title,
-                    "author": book.author,
-                    "category": book.category,
-                    "isbn": book.isbn,
-                    "description": book.description,
-                    "cover_img": book.cover_img,
-                    "donor_name": donor.name if donor else "Unknown",
-                    "total_copies": total_copies,
-                    "available_copies": len(available_copies),
-                    "borrowed_copies": borrowed_copies,
-                    "available_copy_ids": [copy.id for copy in available_copies]
-                })
-        
-        return result
+        return available_books_report(db)
     except Exception as e:
         logger.error(f"Error fetching detailed available books: {e}")
         return []
 
+DASHBOARD_PANELS = (
+    "statistics", "borrow_requests", "donation_requests",
+    "books", "available_books", "users", "borrowed_books", "donations",
+)
+
+def dashboard_statistics(db: Session, panels: dict, books: Optional[list]) -> dict:
+    """Library counters, derived from panels already built when they cover them"""
+    if books is None or "users" not in panels or "donations" not in panels:
+        return library_counts(db)
+    users = panels["users"]
+    return {
+        "total_books": len(books),
+        "available_books": sum(book.available_copies for book, _ in books),
+        "borrowed_books": sum(book.borrowed_copies for book, _ in books),
+        "total_users": len(users),
+        "active_users": sum(1 for user in users if user["is_active"]),
+        "new_users": sum(1 for user in users if user["is_new"]),
+        "total_donations": len(panels["donations"])
+    }
+
+@app.get("/admin/dashboard", tags=["admin"])
+def get_admin_dashboard(
+    panels: Optional[str] = Query(None, description="Comma separated panels, all by default: " + ", ".join(DASHBOARD_PANELS)),
+    db: Session = Depends(get_db)
+):
+    """Every admin dashboard panel in one response, read in one transaction"""
+    wanted = [panel.strip() for panel in panels.split(",") if panel.strip()] if panels else list(DASHBOARD_PANELS)
+    unknown = [panel for panel in wanted if panel not in DASHBOARD_PANELS]
+    if unknown:
+        raise HTTPException(400, detail=f"Unknown panel(s): {', '.join(unknown)}")
+
+    if db.get_bind().dialect.name == "postgresql":
+        # Every panel sees the same snapshot
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+
+    result = {}
+    books = books_with_donors(db) if "books" in wanted or "available_books" in wanted else None
+    if "books" in wanted:
+        result["books"] = [make_detailed_book(book, donor) for book, donor in books]
+    if "available_books" in wanted:
+        result["available_books"] = detailed_available_books(db, books)
+    if "users" in wanted:
+        result["users"] = detailed_users(db)
+    if "borrowed_books" in wanted:
+        result["borrowed_books"] = detailed_borrowed_books(db)
+    if "donations" in wanted:
+        result["donations"] = detailed_donations(db)
+    if "borrow_requests" in wanted:
+        result["borrow_requests"] = pending_borrow_requests(db)
+    if "donation_requests" in wanted:
+        result["donation_requests"] = pending_donation_requests(db)
+    if "statistics" in wanted:
+        result["statistics"] = dashboard_statistics(db, result, books)
+    return {"generated_at": datetime.now(), **{panel: result[panel] for panel in wanted}}
+
 class UserBorrowedBook(BaseModel):
     id: int
     book_title: str
@@ -1477,9 +1629,7 @@ class UserDonatedBook(BaseModel):
     copies_added: int
     admin_comment: Optional[str] = None
 
-class UserStatistics(BaseModel):
-    borrowed_books: List[UserBorrowedBook]
-    donated_books: List[UserDonatedBook]
+class UserStatisticsSummary(BaseModel):
     total_borrowed: int
     total_donated: int
     current_borrowed: int
@@ -1489,126 +1639,194 @@ class UserStatistics(BaseModel):
     rejected_borrow_requests: int
     rejected_donation_requests: int
 
+class UserStatistics(UserStatisticsSummary):
+    borrowed_books: List[UserBorrowedBook]
+    donated_books: List[UserDonatedBook]
+
+class BorrowHistoryPage(BaseModel):
+    items: List[UserBorrowedBook]
+    next_cursor: Optional[str] = None  # Pass as `before` to fetch older requests
+
+class DonationHistoryPage(BaseModel):
+    items: List[UserDonatedBook]
+    next_cursor: Optional[str] = None  # Pass as `before` to fetch older requests
+
+def get_statistics_summary(db: Session, user_id: int) -> UserStatisticsSummary:
+    """The member's counters from user_stats, raising 404 for unknown members"""
+    summary = user_summary(db, user_id)
+    if summary is None:
+        if not db.get(User, user_id):
+            raise HTTPException(404, detail="User not found.")
+        summary = {name: 0 for name in USER_COUNTERS}
+        summary["overdue_books"] = 0
+    return UserStatisticsSummary(
+        total_borrowed=summary["total_borrowed"],
+        total_donated=summary["total_donated"],
+        current_borrowed=summary["current_borrowed"],
+        overdue_books=summary["overdue_books"],
+        pending_borrow_requests=summary["pending_borrow"],
+        pending_donation_requests=summary["pending_donation"],
+        rejected_borrow_requests=summary["rejected_borrow"],
+        rejected_donation_requests=summary["rejected_donation"]
+    )
+
+def summarize_history(borrows: list, donations: list, now: datetime) -> UserStatisticsSummary:
+    """Counters from borrow_history and donation_history rows already loaded"""
+    counts = {status: 0 for status in TransactionStatus}
+    current_borrowed = overdue_books = 0
+    for txn, _, _ in borrows:
+        counts[txn.status] += 1
+        if txn.status == TransactionStatus.SUCCESS and txn.return_date is None:
+            current_borrowed += 1
+            if now > txn.due_date:
+                overdue_books += 1
+    donation_counts = {status: 0 for status in TransactionStatus}
+    for txn, _ in donations:
+        donation_counts[txn.status] += 1
+    return UserStatisticsSummary(
+        total_borrowed=counts[TransactionStatus.SUCCESS],
+        total_donated=donation_counts[TransactionStatus.SUCCESS],
+        current_borrowed=current_borrowed,
+        overdue_books=overdue_books,
+        pending_borrow_requests=counts[TransactionStatus.PENDING],
+        pending_donation_requests=donation_counts[TransactionStatus.PENDING],
+        rejected_borrow_requests=counts[TransactionStatus.FAILED],
+        rejected_donation_requests=donation_counts[TransactionStatus.FAILED]
+    )
+
+def make_borrowed_book(txn: BorrowTransaction, copy: BookCopy, book: Book, now: datetime) -> UserBorrowedBook:
+    status_map = {
+        TransactionStatus.SUCCESS: "Approved" if txn.return_date is None else "Returned",
+        TransactionStatus.PENDING: "Pending",
+        TransactionStatus.FAILED: "Rejected"
+    }
+    status = status_map[txn.status]
+    is_current = txn.status == TransactionStatus.SUCCESS and txn.return_date is None
+    is_overdue = is_current and now > txn.due_date
+    if is_current:
+        status = "Current"
+    if is_overdue:
+        status = "Overdue"
+    
+    return UserBorrowedBook(
+        id=txn.id,
+        book_title=book.title,
+        book_author=book.author,
+        book_category=book.category,
+        due_date=txn.due_date if txn.status == TransactionStatus.SUCCESS else None,
+        borrowed_date=txn.created_at,
+        return_date=txn.return_date,
+        status=status,
+        is_overdue=is_overdue,
+        admin_comment=txn.admin_comment,
+        book_copy_id=copy.id
+    )
+
+def make_donated_book(txn: DonationTransaction, book: Book) -> UserDonatedBook:
+    status_map = {
+        TransactionStatus.SUCCESS: "Approved",
+        TransactionStatus.PENDING: "Pending", 
+        TransactionStatus.FAILED: "Rejected"
+    }
+    return UserDonatedBook(
+        id=txn.id,
+        book_title=book.title,
+        book_author=book.author,
+        book_category=book.category,
+        donation_date=txn.created_at,
+        status=status_map[txn.status],
+        copies_added=1 if txn.status == TransactionStatus.SUCCESS else 0,
+        admin_comment=txn.admin_comment
+    )
+
+def borrow_history(db: Session, user_id: int, limit: Optional[int] = None, before: Optional[tuple] = None) -> list:
+    """(transaction, copy, book) rows of a member's borrow requests, newest first"""
+    query = select(BorrowTransaction, BookCopy, Book).join(
+        BookCopy, BorrowTransaction.book_copy_id == BookCopy.id
+    ).join(
+        Book, BookCopy.book_id == Book.id
+    ).where(BorrowTransaction.user_id == user_id)
+    if before is not None:
+        query = query.where(
+            (BorrowTransaction.created_at < before[0]) |
+            ((BorrowTransaction.created_at == before[0]) & (BorrowTransaction.id < before[1]))
+        )
+    query = query.order_by(BorrowTransaction.created_at.desc(), BorrowTransaction.id.desc())
+    return db.exec(query.limit(limit) if limit else query).all()
+
+def donation_history(db: Session, user_id: int, limit: Optional[int] = None, before: Optional[tuple] = None) -> list:
+    """(transaction, book) rows of a member's donation requests, newest first"""
+    query = select(DonationTransaction, Book).join(
+        Book, DonationTransaction.book_id == Book.id
+    ).where(DonationTransaction.user_id == user_id)
+    if before is not None:
+        query = query.where(
+            (DonationTransaction.created_at < before[0]) |
+            ((DonationTransaction.created_at == before[0]) & (DonationTransaction.id < before[1]))
+        )
+    query = query.order_by(DonationTransaction.created_at.desc(), DonationTransaction.id.desc())
+    return db.exec(query.limit(limit) if limit else query).all()
+
+def decode_history_cursor(before: Optional[str]) -> Optional[tuple]:
+    if not before:
+        return None
+    timestamp, txn_id = decode_cursor(before, str, int)
+    try:
+        return datetime.fromisoformat(timestamp), int(txn_id)
+    except (TypeError, ValueError):
+        raise HTTPException(400, detail="Invalid cursor.")
+
 @app.get("/users/{user_id}/statistics", response_model=UserStatistics, tags=["public"])
 def get_user_statistics(user_id: int, db: Session = Depends(get_db)):
     """Get comprehensive statistics for a specific user"""
-    # Check if user exists
-    user = db.get(User, user_id)
-    if not user:
-        raise HTTPException(404, detail="User not found.")
-    
-    # Get ALL borrow transactions (success, pending, failed)
-    borrow_transactions = db.exec(
-        select(BorrowTransaction, BookCopy, Book).join(
-            BookCopy, BorrowTransaction.book_copy_id == BookCopy.id
-        ).join(
-            Book, BookCopy.book_id == Book.id
-        ).where(
-            BorrowTransaction.user_id == user_id
-        ).order_by(BorrowTransaction.created_at.desc())
-    ).all()
-    
-    borrowed_books = []
-    current_borrowed = 0
-    overdue_books = 0
-    pending_borrow = 0
-    rejected_borrow = 0
-    successful_borrow = 0
-    
-    for txn, copy, book in borrow_transactions:
-        status_map = {
-            TransactionStatus.SUCCESS: "Approved" if txn.return_date is None else "Returned",
-            TransactionStatus.PENDING: "Pending",
-            TransactionStatus.FAILED: "Rejected"
-        }
-        
-        status = status_map[txn.status]
-        is_current = txn.status == TransactionStatus.SUCCESS and txn.return_date is None
-        is_overdue = is_current and datetime.now() > txn.due_date
-        
-        if txn.status == TransactionStatus.SUCCESS:
-            successful_borrow += 1
-            if is_current:
-                current_borrowed += 1
-                status = "Current"
-        elif txn.status == TransactionStatus.PENDING:
-            pending_borrow += 1
-        elif txn.status == TransactionStatus.FAILED:
-            rejected_borrow += 1
-            
-        if is_overdue:
-            overdue_books += 1
-            status = "Overdue"
-            
-        borrowed_books.append(UserBorrowedBook(
-            id=txn.id,
-            book_title=book.title,
-            book_author=book.author,
-            book_category=book.category,
-            due_date=txn.due_date if txn.status == TransactionStatus.SUCCESS else None,
-            borrowed_date=txn.created_at,
-            return_date=txn.return_date,
-            status=status,
-            is_overdue=is_overdue,
-            admin_comment=txn.admin_comment,
-            book_copy_id=copy.id
-        ))
-    
-    # Get ALL donation transactions (success, pending, failed)
-    donation_transactions = db.exec(
-        select(DonationTransaction, Book).join(
-            Book, DonationTransaction.book_id == Book.id
-        ).where(
-            DonationTransaction.user_id == user_id
-        ).order_by(DonationTransaction.created_at.desc())
-    ).all()
-    
-    donated_books = []
-    pending_donation = 0
-    rejected_donation = 0
-    successful_donation = 0
-    
-    for txn, book in donation_transactions:
-        status_map = {
-            TransactionStatus.SUCCESS: "Approved",
-            TransactionStatus.PENDING: "Pending", 
-            TransactionStatus.FAILED: "Rejected"
-        }
-        
-        status = status_map[txn.status]
-        copies_added = 1 if txn.status == TransactionStatus.SUCCESS else 0
-        
-        if txn.status == TransactionStatus.SUCCESS:
-            successful_donation += 1
-        elif txn.status == TransactionStatus.PENDING:
-            pending_donation += 1
-        elif txn.status == TransactionStatus.FAILED:
-            rejected_donation += 1
-        
-        donated_books.append(UserDonatedBook(
-            id=txn.id,
-            book_title=book.title,
-            book_author=book.author,
-            book_category=book.category,
-            donation_date=txn.created_at,
-            status=status,
-            copies_added=copies_added,
-            admin_comment=txn.admin_comment
-        ))
-    
+    summary = get_statistics_summary(db, user_id)
+    now = datetime.now()
     return UserStatistics(
-        borrowed_books=borrowed_books,
-        donated_books=donated_books,
-        total_borrowed=successful_borrow,
-        total_donated=successful_donation,
-        current_borrowed=current_borrowed,
-        overdue_books=overdue_books,
-        pending_borrow_requests=pending_borrow,
-        pending_donation_requests=pending_donation,
-        rejected_borrow_requests=rejected_borrow,
-        rejected_donation_requests=rejected_donation
+        **summary.model_dump(),
+        borrowed_books=[make_borrowed_book(txn, copy, book, now) for txn, copy, book in borrow_history(db, user_id)],
+        donated_books=[make_donated_book(txn, book) for txn, book in donation_history(db, user_id)]
     )
 
+@app.get("/users/{user_id}/statistics/summary", response_model=UserStatisticsSummary, tags=["public"])
+def get_user_statistics_summary(user_id: int, db: Session = Depends(get_db)):
+    """Get a user's borrow and donation counters without the history lists"""
+    return get_statistics_summary(db, user_id)
+
+@app.get("/users/{user_id}/borrow-history/page", response_model=BorrowHistoryPage, tags=["public"])
+def get_borrow_history_page(
+    user_id: int,
+    before: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Page back through a user's borrow requests, newest first"""
+    if not db.get(User, user_id):
+        raise HTTPException(404, detail="User not found.")
+    rows = borrow_history(db, user_id, limit + 1, decode_history_cursor(before))
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][0].created_at.isoformat(), rows[-1][0].id)
+    now = datetime.now()
+    return BorrowHistoryPage(items=[make_borrowed_book(txn, copy, book, now) for txn, copy, book in rows], next_cursor=next_cursor)
+
+@app.get("/users/{user_id}/donation-history/page", response_model=DonationHistoryPage, tags=["public"])
+def get_donation_history_page(
+    user_id: int,
+    before: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Page back through a user's donation requests, newest first"""
+    if not db.get(User, user_id):
+        raise HTTPException(404, detail="User not found.")
+    rows = donation_history(db, user_id, limit + 1, decode_history_cursor(before))
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][0].created_at.isoformat(), rows[-1][0].id)
+    return DonationHistoryPage(items=[make_donated_book(txn, book) for txn, book in rows], next_cursor=next_cursor)
+
 # ===== NOTIFICATION ROUTES =====
 
 class Notification(BaseModel):
@@ -1634,239 +1852,192 @@ class AnnouncementResponse(BaseModel):
     is_active: bool
     target_users: Optional[List[int]] = None  # None for broadcast, list of user IDs for targeted
 
+class NotificationPage(BaseModel):
+    items: List[Notification]
+    next_cursor: Optional[str] = None  # Pass as `before` to fetch older notifications
+
+def make_notification(notification: UserNotification, state: ReadState) -> Notification:
+    return Notification(
+        id=notification.id,
+        type=notification.type.value,
+        message=notification.message,
+        timestamp=notification.created_at.isoformat(),
+        read=state.is_read(notification.id)
+    )
+
 @app.get("/users/{user_id}/notifications", response_model=List[Notification], tags=["public"])
-def get_user_notifications(user_id: int, db: Session = Depends(get_db)):
-    """Get real notifications for a specific user based on their activity"""
+def get_user_notifications(user_id: int, limit: int = Query(50, ge=1, le=100), db: Session = Depends(get_db)):
+    """Get a user's newest notifications and active announcements"""
     # Check if user exists
     user = db.get(User, user_id)
     if not user:
         raise HTTPException(404, detail="User not found.")
     
-    notifications = []
-    notification_id = 1
-    
-    # 1. Check for overdue books (due date reminders)
-    overdue_books = db.exec(
-        select(BorrowTransaction, BookCopy, Book).join(
-            BookCopy, BorrowTransaction.book_copy_id == BookCopy.id
-        ).join(
-            Book, BookCopy.book_id == Book.id
-        ).where(
-            (BorrowTransaction.user_id == user_id) &
-            (BorrowTransaction.status == TransactionStatus.SUCCESS) &
-            (BorrowTransaction.return_date.is_(None)) &
-            (BorrowTransaction.due_date < datetime.now())
-        )
-    ).all()
-    
-    for txn, copy, book in overdue_books:
-        days_overdue = (datetime.now() - txn.due_date).days
-        notifications.append(Notification(
-            id=notification_id,
-            type="overdue",
-            message=f"আপনার ধার নেওয়া বই '{book.title}' {days_overdue} দিন মেয়াদোত্তীর্ণ হয়ে গেছে। অনুগ্রহ করে তাড়াতাড়ি ফেরত দিন।",
-            timestamp=txn.due_date.isoformat(),
-            read=is_notification_read(user_id, notification_id)
-        ))
-        notification_id += 1
-    
-    # 2. Check for books due soon (within 2 days)
-    due_soon_books = db.exec(
-        select(BorrowTransaction, BookCopy, Book).join(
-            BookCopy, BorrowTransaction.book_copy_id == BookCopy.id
-        ).join(
-            Book, BookCopy.book_id == Book.id
-        ).where(
-            (BorrowTransaction.user_id == user_id) &
-            (BorrowTransaction.status == TransactionStatus.SUCCESS) &
-            (BorrowTransaction.return_date.is_(None)) &
-            (BorrowTransaction.due_date >= datetime.now()) &
-            (BorrowTransaction.due_date <= datetime.now() + timedelta(days=2))
-        )
-    ).all()
+    return user_notifications(db, user_id, limit)
+
+def user_notifications(db: Session, user_id: int, limit: int) -> List[Notification]:
+    """Newest stored notifications plus active announcements, newest first"""
+    state = read_state(db, user_id)
+    notifications = [make_notification(notification, state) for notification in inbox(db, user_id, limit)]
     
-    for txn, copy, book in due_soon_books:
-        days_left = (txn.due_date - datetime.now()).days
-        if days_left == 0:
-            message = f"আপনার ধার নেওয়া বই '{book.title}' আজকে ফেরত দিতে হবে।"
-        elif days_left == 1:
-            message = f"আপনার ধার নেওয়া বই '{book.title}' আগামীকাল ফেরত দিতে হবে।"
+    # Active announcements for everyone or for this user
+    for announcement in active_announcements(db, user_id):
+        # Negative so announcement IDs never collide with stored notifications
+        announcement_notification_id = -announcement.id
+        
+        # Determine announcement type based on priority
+        if announcement.priority == "high":
+            announcement_type = "announcement_urgent"
+        elif announcement.priority == "medium":
+            announcement_type = "announcement_important"
         else:
-            message = f"আপনার ধার নেওয়া বই '{book.title}' {days_left} দিনের মধ্যে ফেরত দিতে হবে।"
+            announcement_type = "announcement"
         
         notifications.append(Notification(
-            id=notification_id,
-            type="due_soon",
-            message=message,
-            timestamp=txn.due_date.isoformat(),
-            read=is_notification_read(user_id, notification_id)
-        ))
-        notification_id += 1
-    
-    # 3. Recent approved borrow requests (last 7 days)
-    recent_approved_borrows = db.exec(
-        select(BorrowTransaction, BookCopy, Book).join(
-            BookCopy, BorrowTransaction.book_copy_id == BookCopy.id
-        ).join(
-            Book, BookCopy.book_id == Book.id
-        ).where(
-            (BorrowTransaction.user_id == user_id) &
-            (BorrowTransaction.status == TransactionStatus.SUCCESS) &
-            (BorrowTransaction.updated_at >= datetime.now() - timedelta(days=7))
-        ).order_by(BorrowTransaction.updated_at.desc())
-    ).all()
-    
-    for txn, copy, book in recent_approved_borrows:
-        notifications.append(Notification(
-            id=notification_id,
-            type="borrow_approved",
-            message=f"আপনার ধার নেওয়ার অনুরোধ '{book.title}' অনুমোদিত হয়েছে। বইটি সংগ্রহ করুন।",
-            timestamp=txn.updated_at.isoformat(),
-            read=is_notification_read(user_id, notification_id)
-        ))
-        notification_id += 1
-    
-    # 4. Recent rejected borrow requests (last 7 days)
-    recent_rejected_borrows = db.exec(
-        select(BorrowTransaction, BookCopy, Book).join(
-            BookCopy, BorrowTransaction.book_copy_id == BookCopy.id
-        ).join(
-            Book, BookCopy.book_id == Book.id
-        ).where(
-            (BorrowTransaction.user_id == user_id) &
-            (BorrowTransaction.status == TransactionStatus.FAILED) &
-            (BorrowTransaction.updated_at >= datetime.now() - timedelta(days=7))
-        ).order_by(BorrowTransaction.updated_at.desc())
-    ).all()
-    
-    for txn, copy, book in recent_rejected_borrows:
-        reason = f" কারণ: {txn.admin_comment}" if txn.admin_comment else ""
-        notifications.append(Notification(
-            id=notification_id,
-            type="borrow_rejected",
-            message=f"আপনার ধার নেওয়ার অনুরোধ '{book.title}' প্রত্যাখ্যান করা হয়েছে।{reason}",
-            timestamp=txn.updated_at.isoformat(),
-            read=is_notification_read(user_id, notification_id)
-        ))
-        notification_id += 1
-    
-    # 5. Recent approved donation requests (last 7 days)
-    recent_approved_donations = db.exec(
-        select(DonationTransaction, Book).join(
-            Book, DonationTransaction.book_id == Book.id
-        ).where(
-            (DonationTransaction.user_id == user_id) &
-            (DonationTransaction.status == TransactionStatus.SUCCESS) &
-            (DonationTransaction.updated_at >= datetime.now() - timedelta(days=7))
-        ).order_by(DonationTransaction.updated_at.desc())
-    ).all()
-    
-    for txn, book in recent_approved_donations:
-        notifications.append(Notification(
-            id=notification_id,
-            type="donation_approved",
-            message=f"আপনার দান করার অনুরোধ '{book.title}' অনুমোদিত হয়েছে। ধন্যবাদ!",
-            timestamp=txn.updated_at.isoformat(),
-            read=is_notification_read(user_id, notification_id)
+            id=announcement_notification_id,
+            type=announcement_type,
+            message=f"📢 {announcement.title}: {announcement.message}",
+            timestamp=announcement.created_at.isoformat(),
+            read=state.is_read(announcement_notification_id)
         ))
-        notification_id += 1
-    
-    # 6. Recent rejected donation requests (last 7 days)
-    recent_rejected_donations = db.exec(
-        select(DonationTransaction, Book).join(
-            Book, DonationTransaction.book_id == Book.id
-        ).where(
-            (DonationTransaction.user_id == user_id) &
-            (DonationTransaction.status == TransactionStatus.FAILED) &
-            (DonationTransaction.updated_at >= datetime.now() - timedelta(days=7))
-        ).order_by(DonationTransaction.updated_at.desc())
-    ).all()
-    
-    for txn, book in recent_rejected_donations:
-        reason = f" কারণ: {txn.admin_comment}" if txn.admin_comment else ""
-        notifications.append(Notification(
-            id=notification_id,
-            type="donation_rejected",
-            message=f"আপনার দান করার অনুরোধ '{book.title}' প্রত্যাখ্যান করা হয়েছে।{reason}",
-            timestamp=txn.updated_at.isoformat(),
-            read=is_notification_read(user_id, notification_id)
-        ))
-        notification_id += 1
-    
-    # 7. Welcome message for new users (joined within last 3 days)
-    if user.created_at >= datetime.now() - timedelta(days=3):
-        notifications.append(Notification(
-            id=notification_id,
-            type="welcome",
-            message=f"বইআড্ডায় স্বাগতম, {user.name}! আমাদের লাইব্রেরিতে বই ধার নিন এবং দান করুন।",
-            timestamp=user.created_at.isoformat(),
-            read=is_notification_read(user_id, notification_id)
-        ))
-        notification_id += 1
-    
-    # 8. Active announcements (last 30 days)
-    cutoff_date_announcements = datetime.now() - timedelta(days=30)
-    for announcement in announcements_storage:
-        if (announcement["is_active"] and 
-            announcement["created_at"] >= cutoff_date_announcements):
-            
-            # Check if this announcement is for this user
-            target_users = announcement.get("target_users")
-            if target_users is not None and user_id not in target_users:
-                continue  # Skip this announcement for this user
-            
-            announcement_notification_id = 10000 + announcement["id"]  # Unique ID for announcements
-            
-            # Determine announcement type based on priority
-            if announcement["priority"] == "high":
-                announcement_type = "announcement_urgent"
-            elif announcement["priority"] == "medium":
-                announcement_type = "announcement_important"
-            else:
-                announcement_type = "announcement"
-            
-            notifications.append(Notification(
-                id=announcement_notification_id,
-                type=announcement_type,
-                message=f"📢 {announcement['title']}: {announcement['message']}",
-                timestamp=announcement["created_at"].isoformat(),
-                read=is_notification_read(user_id, announcement_notification_id)
-            ))
     
     # Sort by timestamp (newest first)
     notifications.sort(key=lambda x: datetime.fromisoformat(x.timestamp), reverse=True)
     
     return notifications
 
-# ===== NOTIFICATION STORAGE (In-memory for now) =====
-notification_read_status = {}  # {user_id: set(notification_ids)}
-
-# ===== ANNOUNCEMENT STORAGE (In-memory for now) =====
-announcements_storage = []  # List of announcements
-announcement_counter = 1
-
-def mark_notification_read(user_id: int, notification_id: int):
-    """Mark a notification as read for a user"""
-    if user_id not in notification_read_status:
-        notification_read_status[user_id] = set()
-    notification_read_status[user_id].add(notification_id)
+@app.get("/users/{user_id}/notifications/page", response_model=NotificationPage, tags=["public"])
+def get_user_notification_page(
+    user_id: int,
+    before: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Page back through a user's stored notifications, newest first"""
+    if not db.get(User, user_id):
+        raise HTTPException(404, detail="User not found.")
 
-def is_notification_read(user_id: int, notification_id: int) -> bool:
-    """Check if a notification is read by a user"""
-    return user_id in notification_read_status and notification_id in notification_read_status[user_id]
+    before_key = None
+    if before:
+        timestamp, notification_id = decode_cursor(before, str, int)
+        try:
+            before_key = (datetime.fromisoformat(timestamp), int(notification_id))
+        except (TypeError, ValueError):
+            raise HTTPException(400, detail="Invalid cursor.")
+
+    rows = inbox(db, user_id, limit + 1, before_key)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at.isoformat(), rows[-1].id)
+    state = read_state(db, user_id)
+    return NotificationPage(items=[make_notification(row, state) for row in rows], next_cursor=next_cursor)
+
+@app.get("/users/{user_id}/notifications/unread-count", tags=["public"])
+def get_unread_notification_count(user_id: int, db: Session = Depends(get_db)):
+    """Number of unread notifications and announcements, for the header bell"""
+    state = db.get(NotificationState, user_id)
+    if state is None:
+        if not db.get(User, user_id):
+            raise HTTPException(404, detail="User not found.")
+        return {"unread_count": 0}
+    return {"unread_count": state.unread_count}
+
+@app.put("/notifications/read-all", tags=["public"])
+def mark_all_notifications_as_read(current_user_id: int = Depends(get_current_user_id), db: Session = Depends(get_db)):
+    """Mark every notification and announcement as read"""
+    try:
+        latest_announcement_id = db.exec(select(func.max(Announcement.id))).one() or 0
+        mark_all_read(db, current_user_id, latest_announcement_id)
+        return {"success": True, "message": "All notifications marked as read"}
+    except Exception as e:
+        logger.error(f"Error marking all notifications as read: {e}")
+        return {"success": False, "message": "Failed to mark notifications as read"}
 
 @app.put("/notifications/{notification_id}/read", tags=["public"])
-def mark_notification_as_read(notification_id: int, current_user_id: int = Depends(get_current_user_id)):
+def mark_notification_as_read(
+    notification_id: int,
+    current_user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
     """Mark a notification as read"""
+    if notification_id > 0:
+        notification = db.get(UserNotification, notification_id)
+        if not notification or notification.user_id != current_user_id:
+            raise HTTPException(404, detail="Notification not found")
+    elif not is_announcement_visible(db, -notification_id, current_user_id):
+        raise HTTPException(404, detail="Notification not found")
     try:
-        mark_notification_read(current_user_id, notification_id)
+        mark_read(db, current_user_id, notification_id)
         return {"success": True, "message": "Notification marked as read"}
     except Exception as e:
         logger.error(f"Error marking notification as read: {e}")
         return {"success": False, "message": "Failed to mark notification as read"}
 
+# ===== USER DASHBOARD =====
+
+USER_DASHBOARD_SECTIONS = ("statistics", "borrowed_books", "notifications", "recent_activities")
+
+@app.get("/users/{user_id}/dashboard", tags=["public"])
+def get_user_dashboard(
+    user_id: int,
+    sections: Optional[str] = Query(None, description="Comma separated sections, all by default: " + ", ".join(USER_DASHBOARD_SECTIONS)),
+    notification_limit: int = Query(50, ge=1, le=100),
+    activity_limit: int = Query(10, le=50),
+    activity_days: int = Query(7, le=30),
+    db: Session = Depends(get_db)
+):
+    """A user's statistics, current loans, notifications and recent activity in one response"""
+    wanted = [section.strip() for section in sections.split(",") if section.strip()] if sections else list(USER_DASHBOARD_SECTIONS)
+    unknown = [section for section in wanted if section not in USER_DASHBOARD_SECTIONS]
+    if unknown:
+        raise HTTPException(400, detail=f"Unknown section(s): {', '.join(unknown)}")
+
+    user_with_role = db.exec(
+        select(User, Role).join(Role, User.role_id == Role.id, isouter=True).where(User.id == user_id)
+    ).first()
+    if not user_with_role:
+        raise HTTPException(404, detail="User not found.")
+    _, role = user_with_role
+
+    result = {}
+    now = datetime.now()
+    # The user's borrow requests are loaded once and every loan view is derived from them
+    if "statistics" in wanted or "borrowed_books" in wanted:
+        borrows = borrow_history(db, user_id)
+    if "statistics" in wanted:
+        donations = donation_history(db, user_id)
+        result["statistics"] = UserStatistics(
+            **summarize_history(borrows, donations, now).model_dump(),
+            borrowed_books=[make_borrowed_book(txn, copy, book, now) for txn, copy, book in borrows],
+            donated_books=[make_donated_book(txn, book) for txn, book in donations]
+        )
+    if "borrowed_books" in wanted:
+        current = sorted(
+            (row for row in borrows if row[0].status == TransactionStatus.SUCCESS and row[0].return_date is None),
+            key=lambda row: row[0].id
+        )
+        result["borrowed_books"] = [make_current_loan(txn, copy, book, now) for txn, copy, book in current]
+    if "notifications" in wanted:
+        result["notifications"] = user_notifications(db, user_id, notification_limit)
+    if "recent_activities" in wanted:
+        result["recent_activities"] = user_recent_activities(db, user_id, role, activity_limit, activity_days)
+    return {section: result[section] for section in wanted}
+
 # ===== ANNOUNCEMENT ROUTES =====
 
+def make_announcement_response(announcement: Announcement, targets: Dict[int, List[int]]) -> AnnouncementResponse:
+    return AnnouncementResponse(
+        id=announcement.id,
+        title=announcement.title,
+        message=announcement.message,
+        priority=announcement.priority,
+        created_by=announcement.created_by,
+        created_at=announcement.created_at,
+        is_active=announcement.is_active,
+        target_users=None if announcement.is_broadcast else targets.get(announcement.id, [])
+    )
+
 @app.post("/admin/announcements", response_model=AnnouncementResponse, tags=["admin"])
 def create_announcement(
     announcement: AnnouncementCreate, 
@@ -1874,7 +2045,6 @@ def create_announcement(
     db: Session = Depends(get_db)
 ):
     """Create a new announcement (admin only)"""
-    global announcement_counter
     
     # Check if user is admin
     user_with_role = db.exec(
@@ -1889,22 +2059,27 @@ def create_announcement(
     if role_obj.role_name != RoleType.ADMIN:
         raise HTTPException(403, detail="Only admins can create announcements")
     
-    # Create announcement
-    new_announcement = {
-        "id": announcement_counter,
-        "title": announcement.title,
-        "message": announcement.message,
-        "priority": announcement.priority,
-        "created_by": user_obj.name,
-        "created_at": datetime.now(),
-        "is_active": True,
-        "target_users": announcement.target_users  # None for broadcast, list for targeted
-    }
-    
-    announcements_storage.append(new_announcement)
-    announcement_counter += 1
+    # Create announcement; a broadcast is stored once, a targeted one gets a row per member
+    new_announcement = Announcement(
+        title=announcement.title,
+        message=announcement.message,
+        priority=announcement.priority,
+        created_by_id=user_obj.id,
+        created_by=user_obj.name,
+        is_broadcast=announcement.target_users is None
+    )
+    db.add(new_announcement)
+    db.flush()
+    target_users = []
+    if announcement.target_users:
+        target_users = sorted(db.exec(select(User.id).where(User.id.in_(set(announcement.target_users)))).all())
+        db.add_all(AnnouncementTarget(announcement_id=new_announcement.id, user_id=uid) for uid in target_users)
+        db.flush()
+    adjust_announcement_unread(db, new_announcement, 1)
+    db.commit()
+    db.refresh(new_announcement)
     
-    return AnnouncementResponse(**new_announcement)
+    return make_announcement_response(new_announcement, {new_announcement.id: target_users})
 
 @app.get("/admin/announcements", response_model=List[AnnouncementResponse], tags=["admin"])
 def get_all_announcements(
@@ -1925,7 +2100,9 @@ def get_all_announcements(
     if role_obj.role_name != RoleType.ADMIN:
         raise HTTPException(403, detail="Only admins can view all announcements")
     
-    return [AnnouncementResponse(**ann) for ann in announcements_storage]
+    announcements = db.exec(select(Announcement).order_by(Announcement.id)).all()
+    targets = announcement_targets(db, [ann.id for ann in announcements if not ann.is_broadcast])
+    return [make_announcement_response(ann, targets) for ann in announcements]
 
 @app.put("/admin/announcements/{announcement_id}/toggle", tags=["admin"])
 def toggle_announcement(
@@ -1948,12 +2125,17 @@ def toggle_announcement(
         raise HTTPException(403, detail="Only admins can toggle announcements")
     
     # Find and toggle announcement
-    for announcement in announcements_storage:
-        if announcement["id"] == announcement_id:
-            announcement["is_active"] = not announcement["is_active"]
-            return {"success": True, "message": f"Announcement {'activated' if announcement['is_active'] else 'deactivated'}"}
+    announcement = db.exec(
+        select(Announcement).where(Announcement.id == announcement_id).with_for_update()
+    ).first()
+    if not announcement:
+        raise HTTPException(404, detail="Announcement not found")
     
-    raise HTTPException(404, detail="Announcement not found")
+    announcement.is_active = not announcement.is_active
+    db.add(announcement)
+    adjust_announcement_unread(db, announcement, 1 if announcement.is_active else -1)
+    db.commit()
+    return {"success": True, "message": f"Announcement {'activated' if announcement.is_active else 'deactivated'}"}
 
 @app.delete("/admin/announcements/{announcement_id}", tags=["admin"])
 def delete_announcement(
@@ -1962,7 +2144,6 @@ def delete_announcement(
     db: Session = Depends(get_db)
 ):
     """Delete an announcement (admin only)"""
-    global announcements_storage
     
     # Check if user is admin
     user_with_role = db.exec(
@@ -1978,7 +2159,15 @@ def delete_announcement(
         raise HTTPException(403, detail="Only admins can delete announcements")
     
     # Find and remove announcement
-    announcements_storage = [ann for ann in announcements_storage if ann["id"] != announcement_id]
+    announcement = db.exec(
+        select(Announcement).where(Announcement.id == announcement_id).with_for_update()
+    ).first()
+    if announcement:
+        if announcement.is_active:
+            adjust_announcement_unread(db, announcement, -1)
+        db.exec(delete(AnnouncementTarget).where(AnnouncementTarget.announcement_id == announcement_id))
+        db.delete(announcement)
+        db.commit()
     return {"success": True, "message": "Announcement deleted"}
 
 # ===== UTILITY ROUTES =====
@@ -1989,11 +2178,31 @@ def reset_database():
     if settings.ENVIRONMENT == "production":
         raise HTTPException(403, detail="Not allowed in production")
     
+    # Continue the version counters so ETags issued before the reset can't match
+    with Session(engine) as session:
+        next_version = latest_version(session) + 1
     SQLModel.metadata.drop_all(engine)
     SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        ensure_version_rows(session, start=next_version)
     populate_sample_data()
+    with Session(engine) as session:
+        send_loan_reminders(session)
+        reconcile_unread_counts(session)
+        rebuild_search_index(session)
+        book_index.clear()
+        book_index.refresh(session)
+        suggestion_index.clear()
+        suggestion_index.refresh(session)
+    response_cache.clear()
+    library_stats.clear()
     return {"message": "Database reset and populated with sample data"}
 
+@app.get("/admin/cache-stats", tags=["utility"])
+def get_cache_stats():
+    """Hit/miss counters of this worker's response cache"""
+    return response_cache.stats()
+
 # ===== APPLICATION INFO =====
 
 @app.get("/info", tags=["info"])
@@ -2006,6 +2215,15 @@ def app_info():
         "debug": settings.DEBUG
     }
 
+@app.get("/metrics", tags=["info"])
+async def get_metrics():
+    """Event-loop lag and password hashing of the worker that answers"""
+    return {
+        "pid": os.getpid(),
+        "event_loop": loop_monitor.snapshot(),
+        "password_hashing": password_hasher.stats(),
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -1,6 +1,7 @@
 from typing import Optional, List
 from enum import Enum
-from datetime import datetime
+from datetime import date, datetime
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 from datetime import timedelta
 
@@ -21,6 +22,25 @@ class TransactionStatus(str, Enum):
     SUCCESS = "success"
     FAILED = "failed"
 
+class NotificationType(str, Enum):
+    WELCOME = "welcome"
+    BORROW_APPROVED = "borrow_approved"
+    BORROW_REJECTED = "borrow_rejected"
+    DONATION_APPROVED = "donation_approved"
+    DONATION_REJECTED = "donation_rejected"
+    DUE_SOON = "due_soon"
+    OVERDUE = "overdue"
+
+class ActivityType(str, Enum):
+    MEMBER = "member"
+    BORROW_REQUEST = "borrow_request"
+    BORROW = "borrow"
+    BORROW_REJECTED = "borrow_rejected"
+    RETURN = "return"
+    DONATION_REQUEST = "donation_request"
+    DONATION = "donation"
+    DONATION_REJECTED = "donation_rejected"
+
 # ===== MODELS =====
 
 class Role(SQLModel, table=True):
@@ -33,6 +53,9 @@ class Role(SQLModel, table=True):
 
 class User(SQLModel, table=True):
     __tablename__ = "user"
+    __table_args__ = (
+        Index("ux_user_email", "email", unique=True),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     email: str
@@ -59,13 +82,17 @@ class User(SQLModel, table=True):
 class Book(SQLModel, table=True):
     __tablename__ = "book"
     id: Optional[int] = Field(default=None, primary_key=True)
-    title: str
-    author: str
+    title: str = Field(index=True)
+    author: str = Field(index=True)
     isbn: str
     description: Optional[str] = None
-    category: str
+    category: str = Field(index=True)
     cover_img: Optional[str] = None
     donor_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    # Copy counters, kept in step with book_copy by counters.py
+    total_copies: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    available_copies: int = Field(default=0, index=True, sa_column_kwargs={"server_default": "0"})
+    borrowed_copies: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
     
     donor: Optional[User] = Relationship(back_populates="donated_books")
     copies: List["BookCopy"] = Relationship(back_populates="book")
@@ -74,7 +101,7 @@ class Book(SQLModel, table=True):
 class BookCopy(SQLModel, table=True):
     __tablename__ = "book_copy"
     id: Optional[int] = Field(default=None, primary_key=True)
-    book_id: int = Field(foreign_key="book.id")
+    book_id: int = Field(foreign_key="book.id", index=True)
     current_holder_id: Optional[int] = Field(default=None, foreign_key="user.id")
     status: BookStatus = Field(default=BookStatus.AVAILABLE)
 
@@ -84,6 +111,10 @@ class BookCopy(SQLModel, table=True):
 
 class BorrowTransaction(SQLModel, table=True):
     __tablename__ = "borrow_transaction"
+    __table_args__ = (
+        Index("ix_borrow_transaction_status_due", "status", "due_date"),
+        Index("ix_borrow_transaction_user_status", "user_id", "status"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     book_copy_id: int = Field(foreign_key="book_copy.id")
     user_id: int = Field(foreign_key="user.id")
@@ -122,4 +153,105 @@ class DonationTransaction(SQLModel, table=True):
     admin: Optional[User] = Relationship(
         sa_relationship_kwargs={"foreign_keys": "[DonationTransaction.admin_id]"}
     )
-    book: Optional[Book] = Relationship(back_populates="donation_requests")
\ No newline at end of file
+    book: Optional[Book] = Relationship(back_populates="donation_requests")
+
+class DataVersion(SQLModel, table=True):
+    """Change counter per logical resource, bumped by versions.py on commit"""
+    __tablename__ = "data_version"
+    resource: str = Field(primary_key=True)
+    version: int = Field(default=0)
+
+class ActivityEvent(SQLModel, table=True):
+    """Append-only log of library activity, written with the change it records.
+
+    Names and titles are copied in so feeds read one table without joins.
+    """
+    __tablename__ = "activity_event"
+    __table_args__ = (
+        Index("ix_activity_event_user_created", "user_id", "created_at"),
+        Index("ix_activity_event_admin_created", "admin_id", "created_at"),
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+    type: ActivityType
+    user_id: int = Field(foreign_key="user.id")  # Member the activity is about
+    admin_id: Optional[int] = Field(default=None, foreign_key="user.id")  # Admin who approved or rejected
+    book_id: Optional[int] = Field(default=None, foreign_key="book.id")
+    transaction_id: Optional[int] = None  # Borrow or donation transaction, depending on type
+    user_name: str
+    book_title: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now, index=True)
+
+class UserNotification(SQLModel, table=True):
+    """Notification in a member's inbox, stored when the event behind it happens"""
+    __tablename__ = "notification"
+    __table_args__ = (
+        Index("ix_notification_user_created", "user_id", "created_at"),
+        # One notification of each kind per transaction, so reminder runs can't repeat
+        Index("ux_notification_transaction_type", "transaction_id", "type", unique=True),
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    type: NotificationType
+    message: str
+    transaction_id: Optional[int] = None  # Borrow or donation transaction, depending on type
+    created_at: datetime = Field(default_factory=datetime.now)
+
+class NotificationState(SQLModel, table=True):
+    """Per-member notification read state and unread counter.
+
+    Stored notifications with IDs up to read_up_to are read, as are the
+    sparse IDs above it in read_ids (comma separated; negative for
+    announcements). Announcements up to announcements_read_up_to are read.
+    """
+    __tablename__ = "notification_state"
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    read_up_to: int = Field(default=0)
+    announcements_read_up_to: int = Field(default=0)
+    read_ids: str = Field(default="")
+    # Unread notifications plus unread active announcements, kept by notifications.py
+    unread_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+
+class Announcement(SQLModel, table=True):
+    """Admin announcement; broadcasts are stored once and read by every member"""
+    __tablename__ = "announcement"
+    # Read state is kept by ID, so SQLite must not hand a deleted announcement's ID to a new one
+    __table_args__ = {"sqlite_autoincrement": True}
+    id: Optional[int] = Field(default=None, primary_key=True)
+    title: str
+    message: str
+    priority: str = "normal"  # "high", "medium", "normal"
+    created_by_id: int = Field(foreign_key="user.id")
+    created_by: str  # Admin name at the time
+    is_broadcast: bool = True  # False means only the members in announcement_target
+    is_active: bool = Field(default=True, index=True)
+    created_at: datetime = Field(default_factory=datetime.now)
+
+class AnnouncementTarget(SQLModel, table=True):
+    """Member a targeted announcement is meant for"""
+    __tablename__ = "announcement_target"
+    __table_args__ = (
+        Index("ix_announcement_target_user", "user_id", "announcement_id"),
+    )
+    announcement_id: int = Field(foreign_key="announcement.id", primary_key=True)
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+
+class DailyStats(SQLModel, table=True):
+    """Per-day activity totals, kept by rollups.py for time-series statistics"""
+    __tablename__ = "daily_stats"
+    day: date = Field(primary_key=True)
+    borrows: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    returns: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    donations: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    new_members: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+
+class UserStats(SQLModel, table=True):
+    """Per-member borrow and donation counters, kept by user_stats.py"""
+    __tablename__ = "user_stats"
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    total_borrowed: int = Field(default=0, sa_column_kwargs={"server_default": "0"})  # Approved, returned or not
+    current_borrowed: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    pending_borrow: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    rejected_borrow: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    total_donated: int = Field(default=0, sa_column_kwargs={"server_default": "0"})  # Approved
+    pending_donation: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    rejected_donation: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
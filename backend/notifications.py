@@ -0,0 +1,345 @@
+"""Member notifications, stored when the event behind them happens.
+
+Welcome, approval and rejection notifications are written in the same
+transaction as the change. Loan reminders are written by the scheduled job
+in reminders.py. Every notification keeps
+its primary key for good, so read marks can't drift onto other items.
+
+Read state is one NotificationState row per member: a high-water mark plus
+the few IDs read above it, so checking a whole page costs one lookup. The
+row also carries the member's unread count, adjusted with relative UPDATEs
+whenever a notification or announcement appears, is read or goes away.
+Run this module to recompute the counters from the read state and report
+drift:
+
+    python notifications.py
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import bindparam, literal, update
+from sqlmodel import Session, select, func
+
+from models import (
+    Announcement, AnnouncementTarget, Book, BookCopy, BorrowTransaction, DonationTransaction, NotificationState, NotificationType,
+    TransactionStatus, User, UserNotification
+)
+
+# How far back backfill_notifications looks, matching what the inbox used to show
+BACKFILL_HANDLED_DAYS = 7
+BACKFILL_WELCOME_DAYS = 3
+
+def notify(
+    db: Session,
+    user_id: int,
+    type: NotificationType,
+    message: str,
+    transaction_id: Optional[int] = None,
+    created_at: Optional[datetime] = None,
+):
+    """Add a notification to the caller's transaction (caller commits)"""
+    db.add(UserNotification(
+        user_id=user_id,
+        type=type,
+        message=message,
+        transaction_id=transaction_id,
+        created_at=created_at or datetime.now(),
+    ))
+    _adjust_unread(db, user_id, 1)
+
+def _adjust_unread(db: Session, user_id: int, delta: int):
+    result = db.exec(
+        update(NotificationState)
+        .where(NotificationState.user_id == user_id)
+        .values(unread_count=NotificationState.unread_count + delta)
+    )
+    if result.rowcount == 0:
+        db.add(NotificationState(user_id=user_id, unread_count=max(delta, 0)))
+
+def notify_many(db: Session, notifications: List[UserNotification]):
+    """Add notifications for many members with one counter UPDATE batch (caller commits)"""
+    if not notifications:
+        return
+    db.add_all(notifications)
+    counts = Counter(notification.user_id for notification in notifications)
+    existing = set(db.exec(select(NotificationState.user_id).where(NotificationState.user_id.in_(counts))).all())
+    db.add_all(NotificationState(user_id=user_id) for user_id in counts if user_id not in existing)
+    db.flush()
+    db.connection().execute(
+        update(NotificationState)
+        .where(NotificationState.user_id == bindparam("member"))
+        .values(unread_count=NotificationState.unread_count + bindparam("delta")),
+        [{"member": user_id, "delta": count} for user_id, count in counts.items()]
+    )
+
+def welcome_message(user: User) -> str:
+    return f"বইআড্ডায় স্বাগতম, {user.name}! আমাদের লাইব্রেরিতে বই ধার নিন এবং দান করুন।"
+
+def handled_message(type: NotificationType, book_title: str, comment: Optional[str] = None) -> str:
+    reason = f" কারণ: {comment}" if comment else ""
+    if type == NotificationType.BORROW_APPROVED:
+        return f"আপনার ধার নেওয়ার অনুরোধ '{book_title}' অনুমোদিত হয়েছে। বইটি সংগ্রহ করুন।"
+    if type == NotificationType.BORROW_REJECTED:
+        return f"আপনার ধার নেওয়ার অনুরোধ '{book_title}' প্রত্যাখ্যান করা হয়েছে।{reason}"
+    if type == NotificationType.DONATION_APPROVED:
+        return f"আপনার দান করার অনুরোধ '{book_title}' অনুমোদিত হয়েছে। ধন্যবাদ!"
+    return f"আপনার দান করার অনুরোধ '{book_title}' প্রত্যাখ্যান করা হয়েছে।{reason}"
+
+def reminder_message(type: NotificationType, book_title: str, due_date: datetime, now: datetime) -> str:
+    if type == NotificationType.OVERDUE:
+        return f"আপনার ধার নেওয়া বই '{book_title}' ফেরত দেওয়ার সময় পেরিয়ে গেছে। অনুগ্রহ করে তাড়াতাড়ি ফেরত দিন।"
+    days_left = (due_date - now).days
+    if days_left == 0:
+        return f"আপনার ধার নেওয়া বই '{book_title}' আজকে ফেরত দিতে হবে।"
+    if days_left == 1:
+        return f"আপনার ধার নেওয়া বই '{book_title}' আগামীকাল ফেরত দিতে হবে।"
+    return f"আপনার ধার নেওয়া বই '{book_title}' {days_left} দিনের মধ্যে ফেরত দিতে হবে।"
+
+def inbox(db: Session, user_id: int, limit: int, before: Optional[tuple] = None) -> List[UserNotification]:
+    """Newest notifications first, optionally below a (created_at, id) key"""
+    query = select(UserNotification).where(UserNotification.user_id == user_id)
+    if before is not None:
+        query = query.where(
+            (UserNotification.created_at < before[0]) |
+            ((UserNotification.created_at == before[0]) & (UserNotification.id < before[1]))
+        )
+    return db.exec(
+        query.order_by(UserNotification.created_at.desc(), UserNotification.id.desc()).limit(limit)
+    ).all()
+
+class ReadState:
+    """Read marks of one member, loaded once per request"""
+    def __init__(self, state: Optional[NotificationState]):
+        self.read_up_to = state.read_up_to if state else 0
+        self.announcements_read_up_to = state.announcements_read_up_to if state else 0
+        self.read_ids: Set[int] = parse_ids(state.read_ids) if state else set()
+
+    def is_read(self, notification_id: int) -> bool:
+        """Stored notifications have positive IDs, announcements negative ones"""
+        if notification_id in self.read_ids:
+            return True
+        if notification_id > 0:
+            return notification_id <= self.read_up_to
+        return -notification_id <= self.announcements_read_up_to
+
+def parse_ids(value: str) -> Set[int]:
+    return {int(part) for part in value.split(",") if part}
+
+def format_ids(ids: Set[int]) -> str:
+    return ",".join(str(notification_id) for notification_id in sorted(ids))
+
+def read_state(db: Session, user_id: int) -> ReadState:
+    return ReadState(db.get(NotificationState, user_id))
+
+def _lock_state(db: Session, user_id: int) -> NotificationState:
+    # Row lock where supported, so concurrent marks from other workers aren't lost
+    state = db.exec(
+        select(NotificationState).where(NotificationState.user_id == user_id).with_for_update()
+    ).first()
+    if state is None:
+        state = NotificationState(user_id=user_id)
+        db.add(state)
+    return state
+
+def mark_read(db: Session, user_id: int, notification_id: int) -> bool:
+    """Mark one notification read, returning False if it was already read"""
+    state = _lock_state(db, user_id)
+    current = ReadState(state)
+    if current.is_read(notification_id):
+        return False
+
+    state.unread_count = max(state.unread_count - 1, 0)
+    read_ids = current.read_ids | {notification_id}
+    if notification_id > 0:
+        # Raise the mark to just below the oldest unread notification, so
+        # the sparse set only holds reads that are out of order
+        oldest_unread = db.exec(
+            select(func.min(UserNotification.id)).where(
+                UserNotification.user_id == user_id,
+                UserNotification.id > state.read_up_to,
+                UserNotification.id.notin_([i for i in read_ids if i > 0]),
+            )
+        ).first()
+        if oldest_unread is None:
+            oldest_unread = max(read_ids) + 1
+        state.read_up_to = oldest_unread - 1
+        read_ids = {i for i in read_ids if i < 0 or i > state.read_up_to}
+
+    state.read_ids = format_ids(read_ids)
+    db.add(state)
+    db.commit()
+    return True
+
+def mark_all_read(db: Session, user_id: int, latest_announcement_id: int):
+    """Mark everything in the member's inbox read"""
+    state = _lock_state(db, user_id)
+    latest = db.exec(
+        select(func.max(UserNotification.id)).where(UserNotification.user_id == user_id)
+    ).first()
+    state.read_up_to = max(state.read_up_to, latest or 0)
+    state.announcements_read_up_to = max(state.announcements_read_up_to, latest_announcement_id)
+    state.read_ids = ""
+    state.unread_count = 0
+    db.add(state)
+    db.commit()
+
+def active_announcements(db: Session, user_id: int) -> List[Announcement]:
+    """Active broadcasts plus active announcements targeted at the member, newest first"""
+    return db.exec(
+        select(Announcement)
+        .outerjoin(
+            AnnouncementTarget,
+            (AnnouncementTarget.announcement_id == Announcement.id) & (AnnouncementTarget.user_id == user_id)
+        )
+        .where(
+            Announcement.is_active == True,
+            (Announcement.is_broadcast == True) | AnnouncementTarget.user_id.is_not(None)
+        )
+        .order_by(Announcement.created_at.desc(), Announcement.id.desc())
+    ).all()
+
+def is_announcement_visible(db: Session, announcement_id: int, user_id: int) -> bool:
+    announcement = db.get(Announcement, announcement_id)
+    if not announcement or not announcement.is_active:
+        return False
+    return announcement.is_broadcast or db.get(AnnouncementTarget, (announcement_id, user_id)) is not None
+
+def announcement_targets(db: Session, announcement_ids: List[int]) -> Dict[int, List[int]]:
+    """Target member IDs of each targeted announcement"""
+    targets: Dict[int, List[int]] = {}
+    if announcement_ids:
+        for announcement_id, user_id in db.exec(
+            select(AnnouncementTarget.announcement_id, AnnouncementTarget.user_id)
+            .where(AnnouncementTarget.announcement_id.in_(announcement_ids))
+            .order_by(AnnouncementTarget.announcement_id, AnnouncementTarget.user_id)
+        ).all():
+            targets.setdefault(announcement_id, []).append(user_id)
+    return targets
+
+def adjust_announcement_unread(db: Session, announcement: Announcement, delta: int):
+    """Count an announcement in (+1) or out of (-1) the unread counters of
+    members who haven't read it (caller commits)"""
+    marker = literal(",") + NotificationState.read_ids + literal(",")
+    query = (
+        update(NotificationState)
+        .where(
+            NotificationState.announcements_read_up_to < announcement.id,
+            ~marker.contains(f",-{announcement.id},"),
+        )
+        .values(unread_count=NotificationState.unread_count + delta)
+    )
+    if not announcement.is_broadcast:
+        query = query.where(NotificationState.user_id.in_(
+            select(AnnouncementTarget.user_id).where(AnnouncementTarget.announcement_id == announcement.id)
+        ))
+    db.exec(query)
+
+def reconcile_unread_counts(db: Session) -> int:
+    """Create missing state rows and recompute every unread counter.
+
+    The counts are computed in Python and written back as absolute values, so
+    run it while the app is stopped (python notifications.py), not at startup.
+    Returns how many counters were wrong.
+    """
+    states = {state.user_id: state for state in db.exec(select(NotificationState)).all()}
+    for user_id in db.exec(select(User.id)).all():
+        if user_id not in states:
+            states[user_id] = NotificationState(user_id=user_id)
+            db.add(states[user_id])
+    db.flush()
+
+    unread = {user_id: 0 for user_id in states}
+    above_mark = db.exec(
+        select(UserNotification.user_id, UserNotification.id)
+        .join(NotificationState, NotificationState.user_id == UserNotification.user_id)
+        .where(UserNotification.id > NotificationState.read_up_to)
+    ).all()
+    parsed = {user_id: ReadState(state) for user_id, state in states.items()}
+    for user_id, notification_id in above_mark:
+        if not parsed[user_id].is_read(notification_id):
+            unread[user_id] += 1
+
+    announcements = db.exec(select(Announcement).where(Announcement.is_active == True)).all()
+    targets = announcement_targets(db, [ann.id for ann in announcements if not ann.is_broadcast])
+    for announcement in announcements:
+        readers = states if announcement.is_broadcast else targets.get(announcement.id, [])
+        for user_id in readers:
+            if user_id in parsed and not parsed[user_id].is_read(-announcement.id):
+                unread[user_id] += 1
+
+    wrong = 0
+    for user_id, state in states.items():
+        if state.unread_count != unread[user_id]:
+            state.unread_count = unread[user_id]
+            db.add(state)
+            wrong += 1
+    db.commit()
+    return wrong
+
+def backfill_notifications(db: Session) -> int:
+    """Store the notifications the inbox used to derive on the fly.
+
+    Only runs while the table is empty, and only covers recent events.
+    """
+    if db.exec(select(UserNotification.id).limit(1)).first() is not None:
+        return 0
+
+    now = datetime.now()
+    handled_since = now - timedelta(days=BACKFILL_HANDLED_DAYS)
+    notifications = []
+
+    for user in db.exec(select(User).where(User.created_at >= now - timedelta(days=BACKFILL_WELCOME_DAYS))).all():
+        notifications.append(UserNotification(
+            user_id=user.id, type=NotificationType.WELCOME, message=welcome_message(user),
+            created_at=user.created_at,
+        ))
+
+    borrows = db.exec(
+        select(BorrowTransaction, Book.title)
+        .join(BookCopy, BorrowTransaction.book_copy_id == BookCopy.id)
+        .join(Book, BookCopy.book_id == Book.id)
+        .where(
+            BorrowTransaction.status.in_([TransactionStatus.SUCCESS, TransactionStatus.FAILED]),
+            BorrowTransaction.updated_at >= handled_since,
+        )
+    ).all()
+    for txn, title in borrows:
+        type = NotificationType.BORROW_APPROVED if txn.status == TransactionStatus.SUCCESS else NotificationType.BORROW_REJECTED
+        notifications.append(UserNotification(
+            user_id=txn.user_id, type=type, message=handled_message(type, title, txn.admin_comment),
+            transaction_id=txn.id, created_at=txn.updated_at,
+        ))
+
+    donations = db.exec(
+        select(DonationTransaction, Book.title)
+        .join(Book, DonationTransaction.book_id == Book.id)
+        .where(
+            DonationTransaction.status.in_([TransactionStatus.SUCCESS, TransactionStatus.FAILED]),
+            DonationTransaction.updated_at >= handled_since,
+        )
+    ).all()
+    for txn, title in donations:
+        type = NotificationType.DONATION_APPROVED if txn.status == TransactionStatus.SUCCESS else NotificationType.DONATION_REJECTED
+        notifications.append(UserNotification(
+            user_id=txn.user_id, type=type, message=handled_message(type, title, txn.admin_comment),
+            transaction_id=txn.id, created_at=txn.updated_at,
+        ))
+
+    # Insert in time order so IDs follow created_at
+    notifications.sort(key=lambda notification: notification.created_at)
+    notify_many(db, notifications)
+    db.commit()
+    return len(notifications)
+
+if __name__ == "__main__":
+    from database import engine
+    from logging_config import setup_logging
+
+    logger = setup_logging()
+    with Session(engine) as session:
+        wrong = reconcile_unread_counts(session)
+    if wrong:
+        logger.warning(f"Corrected unread notification counts for {wrong} user(s)")
+    else:
+        logger.info("All unread notification counts are correct")
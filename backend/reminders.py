@@ -0,0 +1,120 @@
+"""Scheduled loan reminders.
+
+One set-based pass over active loans stores a due-soon or overdue
+notification for every loan that doesn't have one yet. A unique index on
+(transaction_id, type) makes passes idempotent: if two workers race, the
+later commit fails and its reminders are left to the one that won.
+
+Every worker runs a pass each REMINDER_INTERVAL seconds. Set it to 0 to
+turn that off and run this module as a separate worker instead:
+
+    python reminders.py [--once]
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, exists, or_
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+from database import engine
+from models import Book, BookCopy, BorrowTransaction, NotificationType, TransactionStatus, UserNotification
+from notifications import notify_many, reminder_message
+
+logger = logging.getLogger("boiadda")
+
+DUE_SOON_DAYS = 2
+
+def _sent(type: NotificationType):
+    return exists().where(UserNotification.transaction_id == BorrowTransaction.id, UserNotification.type == type)
+
+def send_loan_reminders(db: Session, now: Optional[datetime] = None) -> int:
+    """Store the reminders no member has been sent yet, returning how many were added"""
+    now = now or datetime.now()
+    due = BorrowTransaction.due_date
+    loans = db.exec(
+        select(BorrowTransaction.id, BorrowTransaction.user_id, due, Book.title)
+        .join(BookCopy, BorrowTransaction.book_copy_id == BookCopy.id)
+        .join(Book, BookCopy.book_id == Book.id)
+        .where(
+            BorrowTransaction.status == TransactionStatus.SUCCESS,
+            due <= now + timedelta(days=DUE_SOON_DAYS),
+            BorrowTransaction.return_date.is_(None),
+            or_(
+                and_(due < now, ~_sent(NotificationType.OVERDUE)),
+                and_(due >= now, ~_sent(NotificationType.DUE_SOON)),
+            ),
+        )
+    ).all()
+
+    reminders = []
+    for loan_id, user_id, due_date, title in loans:
+        type = NotificationType.OVERDUE if due_date < now else NotificationType.DUE_SOON
+        reminders.append(UserNotification(
+            user_id=user_id, type=type, message=reminder_message(type, title, due_date, now),
+            transaction_id=loan_id, created_at=now,
+        ))
+    if not reminders:
+        return 0
+    notify_many(db, reminders)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        logger.info("Loan reminders were sent by another worker, skipping this run")
+        return 0
+    return len(reminders)
+
+def run_reminders() -> int:
+    with Session(engine) as session:
+        return send_loan_reminders(session)
+
+class ReminderScheduler:
+    """Runs send_loan_reminders every interval in the background"""
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                sent = await run_in_threadpool(run_reminders)
+                if sent:
+                    logger.info(f"Sent {sent} loan reminder(s)")
+            except Exception as e:
+                logger.error(f"Loan reminder run failed: {e}")
+            await asyncio.sleep(self.interval)
+
+reminder_scheduler = ReminderScheduler(settings.REMINDER_INTERVAL)
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from logging_config import setup_logging
+
+    logger = setup_logging()
+    once = "--once" in sys.argv[1:]
+    interval = settings.REMINDER_INTERVAL or 300
+    while True:
+        logger.info(f"Sent {run_reminders()} loan reminder(s)")
+        if once:
+            break
+        time.sleep(interval)
@@ -0,0 +1,124 @@
+"""Daily statistics rollups.
+
+record_activity adds each borrow, return, donation and new member to its
+day's daily_stats row in the same transaction, with an atomic upsert, so
+time-series queries read a few rollup rows instead of raw transactions.
+Run this module to rebuild the rollups from the activity log (all of it, or
+from a given day on):
+
+    python rollups.py [--since YYYY-MM-DD]
+"""
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select, func
+
+from models import ActivityEvent, ActivityType, DailyStats
+
+# Activity types counted in the rollups, and the column each one adds to
+ROLLUP_COLUMNS = {
+    ActivityType.BORROW: "borrows",
+    ActivityType.RETURN: "returns",
+    ActivityType.DONATION: "donations",
+    ActivityType.MEMBER: "new_members",
+}
+
+BUCKETS = ("day", "week", "month")
+
+def add_to_rollup(db: Session, type: ActivityType, created_at: datetime):
+    """Count an event on its day (caller commits); other types are ignored"""
+    column = ROLLUP_COLUMNS.get(type)
+    if column is None:
+        return
+    day = created_at.date()
+    table = DailyStats.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        db.exec(
+            insert(DailyStats)
+            .values(day=day, **{column: 1})
+            .on_conflict_do_update(index_elements=["day"], set_={column: table.c[column] + 1})
+        )
+        return
+    result = db.exec(update(DailyStats).where(DailyStats.day == day).values({column: table.c[column] + 1}))
+    if result.rowcount == 0:
+        db.add(DailyStats(day=day, **{column: 1}))
+
+def _as_date(value) -> date:
+    # SQLite's date() returns text
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+def rebuild_daily_stats(db: Session, since: Optional[date] = None) -> int:
+    """Recompute rollups from the activity log, returning how many days have activity"""
+    query = (
+        select(func.date(ActivityEvent.created_at), ActivityEvent.type, func.count(ActivityEvent.id))
+        .where(ActivityEvent.type.in_(list(ROLLUP_COLUMNS)))
+        .group_by(func.date(ActivityEvent.created_at), ActivityEvent.type)
+    )
+    cleanup = delete(DailyStats)
+    if since is not None:
+        query = query.where(ActivityEvent.created_at >= datetime.combine(since, datetime.min.time()))
+        cleanup = cleanup.where(DailyStats.day >= since)
+
+    days = {}
+    for day, type, count in db.exec(query).all():
+        row = days.setdefault(_as_date(day), DailyStats(day=_as_date(day)))
+        setattr(row, ROLLUP_COLUMNS[type], count)
+    db.exec(cleanup)
+    db.add_all(days.values())
+    db.commit()
+    return len(days)
+
+def backfill_daily_stats(db: Session) -> int:
+    """Build the rollups if there are none yet"""
+    if db.exec(select(DailyStats.day).limit(1)).first() is not None:
+        return 0
+    return rebuild_daily_stats(db)
+
+def bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())  # Monday
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+def _next_bucket(start: date, bucket: str) -> date:
+    if bucket == "week":
+        return start + timedelta(days=7)
+    if bucket == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+def timeseries(db: Session, start: date, end: date, bucket: str) -> List[dict]:
+    """Counts per bucket between two days (inclusive), with empty buckets filled in"""
+    points = {}
+    current = bucket_start(start, bucket)
+    while current <= end:
+        points[current] = {"start": current, **{column: 0 for column in ROLLUP_COLUMNS.values()}}
+        current = _next_bucket(current, bucket)
+
+    rows = db.exec(
+        select(DailyStats).where(DailyStats.day >= start, DailyStats.day <= end).order_by(DailyStats.day)
+    ).all()
+    for row in rows:
+        point = points[bucket_start(row.day, bucket)]
+        for column in ROLLUP_COLUMNS.values():
+            point[column] += getattr(row, column)
+    return list(points.values())
+
+if __name__ == "__main__":
+    import sys
+
+    from database import engine
+    from logging_config import setup_logging
+
+    logger = setup_logging()
+    args = sys.argv[1:]
+    since = date.fromisoformat(args[args.index("--since") + 1]) if "--since" in args else None
+    with Session(engine) as session:
+        days = rebuild_daily_stats(session, since)
+    logger.info(f"Rebuilt daily statistics for {days} day(s) with activity")
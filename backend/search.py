@@ -0,0 +1,167 @@
+"""Full-text search over the book catalog.
+
+SQLite uses an FTS5 virtual table, PostgreSQL a tsvector column with a GIN
+index. Text is tokenized here instead of by the database because both
+built-in parsers split Bengali words at vowel signs and viramas.
+"""
+import logging
+import unicodedata
+from typing import List
+
+from sqlalchemy import text
+from sqlmodel import Session, select, func
+
+from models import Book
+
+logger = logging.getLogger("boiadda")
+
+# Zero-width (non-)joiners only change how conjuncts are rendered
+IGNORED_CHARS = {"\u200c", "\u200d"}
+
+# Column weights used for ranking: title, author, description
+TITLE_WEIGHT = 10.0
+AUTHOR_WEIGHT = 5.0
+DESCRIPTION_WEIGHT = 1.0
+
+def normalize(value: str) -> str:
+    """Normalize text for indexing and matching"""
+    value = unicodedata.normalize("NFC", value or "").casefold()
+    return "".join(ch for ch in value if ch not in IGNORED_CHARS)
+
+def tokenize(value: str) -> List[str]:
+    """Split text into words, keeping combining marks attached to their letters"""
+    tokens = []
+    current = []
+    for ch in normalize(value):
+        # Letters, numbers and marks (Bengali vowel signs, hasanta) form words
+        if unicodedata.category(ch)[0] in "LNM":
+            current.append(ch)
+        elif current:
+            tokens.append("".join(current))
+            current = []
+    if current:
+        tokens.append("".join(current))
+    return tokens
+
+def _dialect(db_or_engine) -> str:
+    bind = db_or_engine.get_bind() if isinstance(db_or_engine, Session) else db_or_engine
+    return bind.dialect.name
+
+def create_search_index(engine):
+    """Create the search index structures if they don't exist"""
+    dialect = _dialect(engine)
+    with engine.begin() as conn:
+        if dialect == "sqlite":
+            # The ascii tokenizer only splits on ASCII punctuation and spaces,
+            # so our pre-tokenized Bengali words are stored as-is
+            conn.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS book_fts "
+                "USING fts5(title, author, description, tokenize='ascii')"
+            ))
+        elif dialect == "postgresql":
+            conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS book_search ("
+                "book_id INTEGER PRIMARY KEY REFERENCES book(id) ON DELETE CASCADE, "
+                "document TSVECTOR NOT NULL)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_book_search_document "
+                "ON book_search USING GIN (document)"
+            ))
+        else:
+            logger.warning(f"Full-text search is not supported on {dialect}")
+
+def _document_params(book: Book) -> dict:
+    return {
+        "id": book.id,
+        "title": " ".join(tokenize(book.title)),
+        "author": " ".join(tokenize(book.author)),
+        "description": " ".join(tokenize(book.description or "")),
+    }
+
+def _postgres_document(tokens_param: str, weight: str) -> str:
+    # array_to_tsvector bypasses the text parser, keeping our tokens intact
+    return f"setweight(array_to_tsvector(string_to_array(:{tokens_param}, ' ')), '{weight}')"
+
+def index_book(db: Session, book: Book):
+    """Add or refresh a book in the search index (caller commits)"""
+    dialect = _dialect(db)
+    params = _document_params(book)
+    if dialect == "sqlite":
+        db.exec(text("DELETE FROM book_fts WHERE rowid = :id").bindparams(id=book.id))
+        db.exec(text(
+            "INSERT INTO book_fts (rowid, title, author, description) "
+            "VALUES (:id, :title, :author, :description)"
+        ).bindparams(**params))
+    elif dialect == "postgresql":
+        document = " || ".join([
+            _postgres_document("title", "A"),
+            _postgres_document("author", "B"),
+            _postgres_document("description", "D"),
+        ])
+        db.exec(text(
+            f"INSERT INTO book_search (book_id, document) VALUES (:id, {document}) "
+            "ON CONFLICT (book_id) DO UPDATE SET document = EXCLUDED.document"
+        ).bindparams(**params))
+
+def rebuild_search_index(db: Session):
+    """Re-index every book from scratch"""
+    dialect = _dialect(db)
+    if dialect == "sqlite":
+        db.exec(text("DELETE FROM book_fts"))
+    elif dialect == "postgresql":
+        db.exec(text("DELETE FROM book_search"))
+    else:
+        return
+    for book in db.exec(select(Book)).all():
+        index_book(db, book)
+    db.commit()
+
+def sync_search_index(db: Session):
+    """Rebuild the index if it has drifted from the book table"""
+    dialect = _dialect(db)
+    if dialect == "sqlite":
+        indexed = db.exec(text("SELECT count(*) FROM book_fts")).one()[0]
+    elif dialect == "postgresql":
+        indexed = db.exec(text("SELECT count(*) FROM book_search")).one()[0]
+    else:
+        return
+    total = db.exec(select(func.count(Book.id))).one()
+    if indexed != total:
+        logger.info(f"Rebuilding search index ({indexed} indexed, {total} books)")
+        rebuild_search_index(db)
+
+def search_book_ids(db: Session, query: str, limit: int = 20) -> List[int]:
+    """Get IDs of books matching every word of the query (the last as a prefix), best match first"""
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+
+    dialect = _dialect(db)
+    if dialect == "sqlite":
+        # Tokens never contain quotes; only the last word may be half-typed
+        match = " ".join(f'"{token}"' for token in tokens[:-1]) + f' "{tokens[-1]}"*'
+        rows = db.exec(text(
+            "SELECT rowid FROM book_fts WHERE book_fts MATCH :match "
+            "ORDER BY bm25(book_fts, :title_weight, :author_weight, :description_weight) "
+            "LIMIT :limit"
+        ).bindparams(
+            match=match,
+            title_weight=TITLE_WEIGHT,
+            author_weight=AUTHOR_WEIGHT,
+            description_weight=DESCRIPTION_WEIGHT,
+            limit=limit,
+        )).all()
+    elif dialect == "postgresql":
+        # Cast instead of to_tsquery so lexemes aren't re-parsed
+        tsquery = " & ".join([f"'{token}'" for token in tokens[:-1]] + [f"'{tokens[-1]}':*"])
+        rows = db.exec(text(
+            "SELECT book_id FROM book_search, CAST(:tsquery AS tsquery) AS query "
+            "WHERE document @@ query "
+            "ORDER BY ts_rank(document, query) DESC, book_id "
+            "LIMIT :limit"
+        ).bindparams(tsquery=tsquery, limit=limit)).all()
+    else:
+        return []
+
+    return [row[0] for row in rows]
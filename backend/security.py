@@ -1,3 +1,9 @@
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from passlib.context import CryptContext
@@ -20,6 +26,91 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
 
+def _percentile_ms(samples: deque, fraction: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] * 1000, 1)
+
+class PasswordHasher:
+    """Runs bcrypt on its own small thread pool.
+
+    bcrypt releases the GIL, so a few threads hash in parallel without
+    taking the threadpool that sync endpoints run on. At most workers +
+    queue_size hashes are admitted at once; past that callers get a 503 with
+    Retry-After instead of queueing behind a burst of logins.
+    """
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = max(workers, 1)
+        self.queue_size = max(queue_size, 0)
+        self.rejected = 0
+        self.hashes = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self._hash_seconds = deque(maxlen=1000)
+        self._wait_seconds = deque(maxlen=1000)
+
+    def _retry_after(self) -> int:
+        # Seconds until the queue ahead has likely drained
+        typical = _percentile_ms(self._hash_seconds, 0.5) or 250
+        return max(1, math.ceil(self._in_flight / self.workers * typical / 1000))
+
+    def _done(self, future):
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, function, *args):
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_size:
+                self.rejected += 1
+                raise HTTPException(
+                    503,
+                    detail="Too many sign-in attempts, please try again shortly",
+                    headers={"Retry-After": str(self._retry_after())},
+                )
+            self._in_flight += 1
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                self._wait_seconds.append(started - submitted)
+                self._hash_seconds.append(time.perf_counter() - started)
+                with self._lock:
+                    self.hashes += 1
+
+        future = self._executor.submit(timed)
+        # Also called if the request goes away before the hash starts
+        future.add_done_callback(self._done)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self._in_flight,
+            "queued": max(self._in_flight - self.workers, 0),
+            "hashes": self.hashes,
+            "rejected": self.rejected,
+            "hash_p50_ms": _percentile_ms(self._hash_seconds, 0.5),
+            "hash_p99_ms": _percentile_ms(self._hash_seconds, 0.99),
+            "wait_p50_ms": _percentile_ms(self._wait_seconds, 0.5),
+            "wait_p99_ms": _percentile_ms(self._wait_seconds, 0.99),
+        }
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE)
+
+async def hash_password(password: str) -> str:
+    """get_password_hash on the password hashing pool (503 when it is full)"""
+    return await password_hasher.run(get_password_hash, password)
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the password hashing pool (503 when it is full)"""
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
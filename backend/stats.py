@@ -0,0 +1,124 @@
+"""Library statistics.
+
+The public counters come from one statement that aggregates each table once
+with conditional sums. Requests read them from a per-worker snapshot and
+never wait on the database once it exists: a request that finds the
+snapshot older than STATS_REFRESH_SECONDS gets it as is and starts a
+background refresh (stale-while-revalidate). A refresh first compares data
+versions and only re-runs the aggregate when books, transactions or users
+changed, or the hour rolled over (new_users counts the last 7 days).
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import case, distinct, true
+from sqlmodel import Session, select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import settings
+from database import async_engine
+from models import Book, BookCopy, BookStatus, BorrowTransaction, DonationTransaction, TransactionStatus, User
+from versions import current_etag
+
+logger = logging.getLogger("boiadda")
+
+STATS_RESOURCES = ("books", "transactions", "users")
+
+EMPTY_COUNTS = {
+    "total_books": 0,
+    "available_books": 0,
+    "borrowed_books": 0,
+    "total_users": 0,
+    "active_users": 0,
+    "new_users": 0,
+    "total_donations": 0,
+}
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+def library_counts(db: Session, now: Optional[datetime] = None) -> dict:
+    """All public counters from a single statement"""
+    week_ago = (now or datetime.now()) - timedelta(days=7)
+    copies = select(
+        _count_if(BookCopy.status == BookStatus.AVAILABLE).label("available"),
+        _count_if(BookCopy.status == BookStatus.BORROWED).label("borrowed"),
+    ).subquery()
+    users = select(
+        func.count(User.id).label("total"),
+        _count_if(User.created_at > week_ago).label("new"),
+    ).subquery()
+    row = db.exec(select(
+        select(func.count(Book.id)).scalar_subquery().label("total_books"),
+        copies.c.available.label("available_books"),
+        copies.c.borrowed.label("borrowed_books"),
+        users.c.total.label("total_users"),
+        # Members with a current loan
+        select(func.count(distinct(BorrowTransaction.user_id))).where(
+            BorrowTransaction.status == TransactionStatus.SUCCESS,
+            BorrowTransaction.return_date.is_(None),
+        ).scalar_subquery().label("active_users"),
+        users.c.new.label("new_users"),
+        select(func.count(DonationTransaction.id)).where(
+            DonationTransaction.status == TransactionStatus.SUCCESS
+        ).scalar_subquery().label("total_donations"),
+    ).select_from(copies).join(users, true())).one()
+    return {name: int(row._mapping[name] or 0) for name in EMPTY_COUNTS}
+
+def stats_etag(db: Session, now: Optional[datetime] = None) -> str:
+    """ETag of the counters: data versions plus the current hour"""
+    etag = current_etag(db, STATS_RESOURCES)
+    return f'{etag[:-1]}-{(now or datetime.now()).strftime("%Y%m%d%H")}"'
+
+class StatsSnapshot:
+    def __init__(self, max_age: float):
+        self.max_age = max_age
+        self._counts: Optional[dict] = None
+        self._etag: Optional[str] = None
+        self._built_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _load(session: Session, known_etag: Optional[str]) -> tuple:
+        now = datetime.now()
+        etag = stats_etag(session, now)
+        if etag == known_etag:
+            return etag, None
+        return etag, library_counts(session, now)
+
+    async def _refresh(self):
+        try:
+            async with AsyncSession(async_engine) as session:
+                etag, counts = await session.run_sync(self._load, self._etag)
+        except Exception as e:
+            logger.error(f"Error refreshing library statistics: {e}")
+            return
+        if counts is not None:
+            self._counts = counts
+        self._etag = etag
+        self._built_at = time.monotonic()
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+        return self._refresh_task
+
+    async def get(self) -> tuple:
+        """(counts, ETag, age in seconds); only the first call waits for the database"""
+        if self._counts is None:
+            await asyncio.shield(self._start_refresh())
+            if self._counts is None:
+                return dict(EMPTY_COUNTS), None, 0.0
+        age = time.monotonic() - self._built_at
+        if age > self.max_age:
+            self._start_refresh()
+        return self._counts, self._etag, age
+
+    def clear(self):
+        self._counts = None
+        self._etag = None
+
+library_stats = StatsSnapshot(settings.STATS_REFRESH_SECONDS)
@@ -0,0 +1,166 @@
+"""In-memory autocomplete over book titles, authors and categories.
+
+Normalized strings live in one sorted list, so a prefix is a bisect range.
+Suggestions are ranked by how often their books have been borrowed. Broad
+prefixes match many entries, so their top results are memoized and new
+books are merged into them.
+
+Refreshes load books past the highest ID the last refresh read, rescanning
+the RESCAN_IDS below it; books this worker adds itself don't move that
+watermark, since other workers may still be committing lower IDs.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Dict, List, Set, Tuple
+
+from sqlmodel import Session, select, func
+
+from models import Book, BookCopy, BorrowTransaction, TransactionStatus
+from search import tokenize
+
+MAX_SUGGESTIONS = 20
+
+# Prefix ranges wider than this have their ranking memoized
+SCAN_LIMIT = 256
+
+# How often books added by other workers and borrow counts are picked up
+REFRESH_SECONDS = 300
+
+# IDs below the refresh watermark checked again, for inserts that commit out of order
+RESCAN_IDS = 50
+
+def suggestion_key(value: str) -> str:
+    return " ".join(tokenize(value))
+
+class SuggestionIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._keys: List[Tuple[str, int]] = []  # (normalized text, suggestion id), sorted
+        self._suggestions: List[dict] = []
+        self._members: List[List[int]] = []  # Book IDs behind each suggestion
+        self._popularity: List[int] = []
+        self._ids: Dict[Tuple[str, str], int] = {}  # (type, key) -> suggestion id for authors and categories
+        self._book_popularity: Dict[int, int] = {}
+        self._top: Dict[str, List[int]] = {}
+        self._book_ids: Set[int] = set()  # Books already registered
+        self._refreshed_up_to = 0  # Highest book ID a refresh has read
+        self._refreshed_at = 0.0
+
+    def _register(self, kind: str, text: str, book_id: int) -> List[Tuple[str, int]]:
+        """Attach a book to a suggestion, returning any new keys to index"""
+        key = suggestion_key(text)
+        if not key:
+            return []
+
+        new_keys = []
+        sid = None if kind == "title" else self._ids.get((kind, key))
+        if sid is None:
+            sid = len(self._suggestions)
+            self._suggestions.append({
+                "text": text.strip(),
+                "type": kind,
+                "book_id": book_id if kind == "title" else None,
+            })
+            self._members.append([])
+            self._popularity.append(0)
+            if kind != "title":
+                self._ids[(kind, key)] = sid
+            # Index every word start so "মানুষ" completes "পাখি ও মানুষ"
+            words = key.split(" ")
+            for i in range(len(words)):
+                new_keys.append((" ".join(words[i:]), sid))
+
+        self._members[sid].append(book_id)
+        self._popularity[sid] += self._book_popularity.get(book_id, 0)
+        return new_keys
+
+    def _register_book(self, book_id: int, title: str, author: str, category: str) -> List[Tuple[str, int]]:
+        if book_id in self._book_ids:
+            return []
+        self._book_ids.add(book_id)
+        return (
+            self._register("title", title, book_id)
+            + self._register("author", author, book_id)
+            + self._register("category", category, book_id)
+        )
+
+    def _rank(self, sid: int):
+        return (-self._popularity[sid], self._suggestions[sid]["text"])
+
+    def add_book(self, book_id: int, title: str, author: str, category: str):
+        with self._lock:
+            for key, sid in self._register_book(book_id, title, author, category):
+                insort(self._keys, (key, sid))
+                # Merge into memoized rankings rather than dropping them
+                for end in range(1, len(key) + 1):
+                    ranked = self._top.get(key[:end])
+                    if ranked is not None and sid not in ranked:
+                        ranked.append(sid)
+                        ranked.sort(key=self._rank)
+                        del ranked[MAX_SUGGESTIONS:]
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def needs_refresh(self) -> bool:
+        """Check whether a refresh is due, claiming it for the caller"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._refreshed_at < REFRESH_SECONDS:
+                return False
+            self._refreshed_at = now
+            return True
+
+    def refresh(self, db: Session):
+        """Index new books and reload borrow counts"""
+        books = db.exec(
+            select(Book.id, Book.title, Book.author, Book.category)
+            .where(Book.id > self._refreshed_up_to - RESCAN_IDS)
+            .order_by(Book.id)
+        ).all()
+        borrow_counts = db.exec(
+            select(BookCopy.book_id, func.count(BorrowTransaction.id))
+            .join(BorrowTransaction, BorrowTransaction.book_copy_id == BookCopy.id)
+            .where(BorrowTransaction.status == TransactionStatus.SUCCESS)
+            .group_by(BookCopy.book_id)
+        ).all()
+
+        with self._lock:
+            # Sort once instead of inserting keys one by one
+            for book_id, title, author, category in books:
+                self._keys.extend(self._register_book(book_id, title, author, category))
+            self._keys.sort()
+            if books:
+                self._refreshed_up_to = max(self._refreshed_up_to, books[-1][0])
+            self._book_popularity = dict(borrow_counts)
+            self._popularity = [
+                sum(self._book_popularity.get(book_id, 0) for book_id in members)
+                for members in self._members
+            ]
+            self._top.clear()
+            self._refreshed_at = time.monotonic()
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[dict]:
+        """Get the most borrowed suggestions starting with the prefix"""
+        key = suggestion_key(prefix)
+        if not key:
+            return []
+
+        with self._lock:
+            ranked = self._top.get(key)
+            if ranked is None:
+                lo = bisect_left(self._keys, (key,))
+                hi = bisect_left(self._keys, (key + "\U0010ffff",))
+                sids = {sid for _, sid in self._keys[lo:hi]}
+                ranked = heapq.nsmallest(MAX_SUGGESTIONS, sids, key=self._rank)
+                if hi - lo > SCAN_LIMIT:
+                    self._top[key] = ranked
+            return [self._suggestions[sid] for sid in ranked[:limit]]
+
+suggestion_index = SuggestionIndex()
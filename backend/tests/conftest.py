@@ -0,0 +1,54 @@
+"""Shared test setup.
+
+main initializes its database on import, so the whole run shares one
+throwaway database; each module seeds rows in its own ID range.
+"""
+import os
+import sys
+import tempfile
+
+_directory = tempfile.mkdtemp(prefix="boiadda-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_directory}/test.db"
+os.environ["SEED_DEMO_DATA"] = "false"
+os.environ["DEBUG"] = "false"
+os.environ["REMINDER_INTERVAL"] = "0"
+# Tests seed with plain INSERTs, which don't bump the data versions cached responses are keyed on
+os.environ["RESPONSE_CACHE_SIZE"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert
+from sqlmodel import Session
+
+import main
+from database import async_engine
+from models import Role, RoleType
+
+# Endpoints on AsyncSession run their statements on the async engine's sync core
+ENGINES = [main.engine, async_engine.sync_engine]
+
+@pytest.fixture(scope="session")
+def client():
+    with Session(main.engine) as session:
+        session.execute(insert(Role), [{"id": 1, "role_name": RoleType.ADMIN}, {"id": 2, "role_name": RoleType.USER}])
+        session.commit()
+    return TestClient(main.app)
+
+@pytest.fixture
+def count_statements(client):
+    """Fetch a URL, returning how many SQL statements it ran and its JSON body"""
+    def fetch(url: str) -> tuple:
+        statements = []
+        def count(*args):
+            statements.append(args[2])
+        for engine in ENGINES:
+            event.listen(engine, "before_cursor_execute", count)
+        try:
+            response = client.get(url)
+        finally:
+            for engine in ENGINES:
+                event.remove(engine, "before_cursor_execute", count)
+        assert response.status_code == 200, url
+        return len(statements), response.json()
+    return fetch
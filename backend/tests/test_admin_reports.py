@@ -0,0 +1,59 @@
+"""The /admin/*/detailed reports must issue the same number of statements
+whatever the amount of data (no per-row queries)."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from sqlmodel import Session
+
+import main
+from models import Book, BookCopy, BookStatus, BorrowTransaction, DonationTransaction, TransactionStatus, User
+
+REPORTS = [
+    "/admin/books/detailed",
+    "/admin/users/detailed",
+    "/admin/borrowed-books/detailed",
+    "/admin/donations/detailed",
+    "/admin/available-books/detailed",
+]
+
+def seed(start: int, count: int):
+    """Add count members, each with a donated book of two copies, one of them on loan"""
+    now = datetime.now()
+    ids = range(start, start + count)
+    with Session(main.engine) as session:
+        session.execute(insert(User), [
+            {"id": i, "name": f"Member {i}", "email": f"member{i}@example.com", "password": "-", "role_id": 2}
+            for i in ids
+        ])
+        session.execute(insert(Book), [
+            {"id": i, "title": f"Book {i}", "author": "Author", "isbn": str(i), "category": "General",
+             "donor_id": i, "total_copies": 2, "available_copies": 1, "borrowed_copies": 1}
+            for i in ids
+        ])
+        session.execute(insert(BookCopy), [
+            {"id": 2 * i + offset, "book_id": i, "status": status}
+            for i in ids
+            for offset, status in ((0, BookStatus.BORROWED), (1, BookStatus.AVAILABLE))
+        ])
+        session.execute(insert(BorrowTransaction), [
+            {"book_copy_id": 2 * i, "user_id": i, "status": TransactionStatus.SUCCESS,
+             "created_at": now - timedelta(days=3), "due_date": now + timedelta(days=11)}
+            for i in ids
+        ])
+        session.execute(insert(DonationTransaction), [
+            {"book_id": i, "user_id": i, "status": TransactionStatus.SUCCESS, "updated_at": now}
+            for i in ids
+        ])
+        session.commit()
+
+def test_report_queries_do_not_grow_with_data(count_statements):
+    n = 5
+    seed(1, n)
+    small = {url: count_statements(url) for url in REPORTS}
+    seed(n + 1, 9 * n)
+    large = {url: count_statements(url) for url in REPORTS}
+
+    for url in REPORTS:
+        (small_queries, small_rows), (large_queries, large_rows) = small[url], large[url]
+        assert len(large_rows) == 10 * len(small_rows) > 0, url
+        assert large_queries == small_queries, f"{url}: {small_queries} statements for {n} rows, {large_queries} for {10 * n}"
@@ -0,0 +1,55 @@
+"""GET /books/ must issue the same number of statements however large the
+catalog is (no per-book queries)."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from sqlmodel import Session
+
+import main
+from models import Book, BookCopy, BookStatus, BorrowTransaction, TransactionStatus, User
+
+FIRST_ID = 1001
+READER_ID = FIRST_ID
+
+def seed(start: int, count: int):
+    """Add count books of two copies each, the reader holding one copy of every book"""
+    now = datetime.now()
+    ids = range(start, start + count)
+    with Session(main.engine) as session:
+        if start == FIRST_ID:
+            session.execute(insert(User), [
+                {"id": READER_ID, "name": "Reader", "email": "reader@example.com", "password": "-", "role_id": 2}
+            ])
+        session.execute(insert(Book), [
+            {"id": i, "title": f"Catalog book {i}", "author": "Author", "isbn": f"catalog-{i}", "category": "General",
+             "total_copies": 2, "available_copies": 1, "borrowed_copies": 1}
+            for i in ids
+        ])
+        session.execute(insert(BookCopy), [
+            {"id": 2 * i + offset, "book_id": i, "status": status}
+            for i in ids
+            for offset, status in ((0, BookStatus.BORROWED), (1, BookStatus.AVAILABLE))
+        ])
+        session.execute(insert(BorrowTransaction), [
+            {"book_copy_id": 2 * i, "user_id": READER_ID, "status": TransactionStatus.SUCCESS,
+             "created_at": now - timedelta(days=3), "due_date": now + timedelta(days=11)}
+            for i in ids
+        ])
+        session.commit()
+
+def test_catalog_queries_do_not_grow_with_books(count_statements):
+    urls = ["/books/", f"/books/?user_id={READER_ID}"]
+    n = 5
+    seed(FIRST_ID, n)
+    small = {url: count_statements(url) for url in urls}
+    seed(FIRST_ID + n, 9 * n)
+    large = {url: count_statements(url) for url in urls}
+
+    for url in urls:
+        (small_queries, small_books), (large_queries, large_books) = small[url], large[url]
+        # Other modules may have added books of their own
+        assert len(large_books) - len(small_books) == 9 * n, url
+        assert large_queries == small_queries, f"{url}: {small_queries} statements before adding {9 * n} books, {large_queries} after"
+
+    blocked = [book for book in large[urls[1]][1] if book["id"] >= FIRST_ID and not book["user_can_borrow"]]
+    assert len(blocked) == 10 * n
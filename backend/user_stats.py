@@ -0,0 +1,126 @@
+"""Per-member borrow and donation counters stored in user_stats.
+
+record_activity adjusts them with relative UPDATEs in the same transaction
+as the request, approval, rejection or return they count, so a member's
+summary is a single-row read. Overdue loans depend on the clock rather than
+on a write, so they are counted in the same statement that reads the row.
+Run this module to recompute every row from the transactions and report
+drift:
+
+    python user_stats.py
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import or_, update
+from sqlmodel import Session, select, func
+
+from models import ActivityType, BorrowTransaction, DonationTransaction, TransactionStatus, User, UserStats
+
+COUNTERS = (
+    "total_borrowed", "current_borrowed", "pending_borrow", "rejected_borrow",
+    "total_donated", "pending_donation", "rejected_donation",
+)
+
+# How each activity moves the member's counters
+_DELTAS = {
+    ActivityType.BORROW_REQUEST: {"pending_borrow": 1},
+    ActivityType.BORROW: {"pending_borrow": -1, "total_borrowed": 1, "current_borrowed": 1},
+    ActivityType.BORROW_REJECTED: {"pending_borrow": -1, "rejected_borrow": 1},
+    ActivityType.RETURN: {"current_borrowed": -1},
+    ActivityType.DONATION_REQUEST: {"pending_donation": 1},
+    ActivityType.DONATION: {"pending_donation": -1, "total_donated": 1},
+    ActivityType.DONATION_REJECTED: {"pending_donation": -1, "rejected_donation": 1},
+}
+
+def adjust_user_stats(db: Session, type: ActivityType, user_id: int):
+    """Apply an activity to the member's counters (caller commits)"""
+    deltas = _DELTAS.get(type)
+    if deltas is None:
+        if type == ActivityType.MEMBER and db.get(UserStats, user_id) is None:
+            db.add(UserStats(user_id=user_id))
+        return
+    result = db.exec(
+        update(UserStats)
+        .where(UserStats.user_id == user_id)
+        .values({name: getattr(UserStats, name) + delta for name, delta in deltas.items()})
+    )
+    if result.rowcount == 0:
+        # Members from before user_stats existed; reconcile_user_stats fills in the rest
+        db.add(UserStats(user_id=user_id, **{name: max(delta, 0) for name, delta in deltas.items()}))
+
+def user_summary(db: Session, user_id: int, now: Optional[datetime] = None) -> Optional[dict]:
+    """The member's counters plus overdue loans, or None if they have no row"""
+    overdue = select(func.count(BorrowTransaction.id)).where(
+        BorrowTransaction.user_id == user_id,
+        BorrowTransaction.status == TransactionStatus.SUCCESS,
+        BorrowTransaction.return_date.is_(None),
+        BorrowTransaction.due_date < (now or datetime.now()),
+    ).scalar_subquery()
+    row = db.exec(select(UserStats, overdue).where(UserStats.user_id == user_id)).first()
+    if row is None:
+        return None
+    stats, overdue_books = row
+    return {**{name: getattr(stats, name) for name in COUNTERS}, "overdue_books": overdue_books}
+
+def _actual_counts() -> dict:
+    """Each counter as a subquery correlated with the member's row"""
+    success, pending, failed = TransactionStatus.SUCCESS, TransactionStatus.PENDING, TransactionStatus.FAILED
+
+    def borrows(*conditions):
+        return (
+            select(func.count(BorrowTransaction.id))
+            .where(BorrowTransaction.user_id == UserStats.user_id, *conditions)
+            .scalar_subquery()
+        )
+
+    def donations(*conditions):
+        return (
+            select(func.count(DonationTransaction.id))
+            .where(DonationTransaction.user_id == UserStats.user_id, *conditions)
+            .scalar_subquery()
+        )
+
+    return {
+        "total_borrowed": borrows(BorrowTransaction.status == success),
+        "current_borrowed": borrows(BorrowTransaction.status == success, BorrowTransaction.return_date.is_(None)),
+        "pending_borrow": borrows(BorrowTransaction.status == pending),
+        "rejected_borrow": borrows(BorrowTransaction.status == failed),
+        "total_donated": donations(DonationTransaction.status == success),
+        "pending_donation": donations(DonationTransaction.status == pending),
+        "rejected_donation": donations(DonationTransaction.status == failed),
+    }
+
+def reconcile_user_stats(db: Session) -> int:
+    """Recompute every member's counters from the transactions.
+
+    Missing rows are inserted empty and every wrong row is rewritten by one
+    UPDATE of correlated subqueries, so counts are taken and stored in the
+    same statement and concurrent relative updates aren't lost.
+    Returns how many rows were missing or wrong.
+    """
+    missing = db.exec(
+        select(User.id).where(~select(UserStats.user_id).where(UserStats.user_id == User.id).exists())
+    ).all()
+    db.add_all(UserStats(user_id=user_id) for user_id in missing)
+    db.flush()
+
+    actual = _actual_counts()
+    drifted = or_(*(getattr(UserStats, name) != value for name, value in actual.items()))
+    wrong = set(db.exec(select(UserStats.user_id).where(drifted)).all())
+    if wrong:
+        db.exec(update(UserStats).where(drifted).values(actual))
+    db.commit()
+    return len(wrong | set(missing))
+
+if __name__ == "__main__":
+    from database import engine
+    from logging_config import setup_logging
+
+    logger = setup_logging()
+    with Session(engine) as session:
+        wrong = reconcile_user_stats(session)
+    if wrong:
+        logger.warning(f"Corrected borrow/donation counters for {wrong} member(s)")
+    else:
+        logger.info("All member counters are correct")
@@ -0,0 +1,97 @@
+"""Data version counters used to answer conditional GETs.
+
+Every commit that writes to a table bumps the version of the resource that
+table belongs to, in the same transaction. Read endpoints combine the
+versions they depend on into a strong ETag.
+"""
+from typing import Iterable
+
+from sqlalchemy import event, update
+from sqlmodel import Session, select, func
+
+from models import (
+    ActivityEvent, Announcement, AnnouncementTarget, Book, BookCopy, BorrowTransaction, DailyStats, DataVersion,
+    DonationTransaction, Role, User, NotificationState, UserNotification, UserStats
+)
+
+# Logical resources and the models whose changes affect them
+RESOURCES = {
+    Book: "books",
+    BookCopy: "books",
+    BorrowTransaction: "transactions",
+    DonationTransaction: "transactions",
+    UserStats: "transactions",
+    User: "users",
+    Role: "users",
+    ActivityEvent: "activity",
+    DailyStats: "activity",
+    UserNotification: "notifications",
+    NotificationState: "notifications",
+    Announcement: "announcements",
+    AnnouncementTarget: "announcements",
+}
+
+def _changed(session: Session) -> set:
+    return session.info.setdefault("changed_resources", set())
+
+def mark_changed(session: Session, *resources: str):
+    """Record changes made outside the ORM unit of work (e.g. raw SQL)"""
+    _changed(session).update(resources)
+
+@event.listens_for(Session, "before_flush")
+def _collect_flushed(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        resource = RESOURCES.get(type(obj))
+        if resource:
+            _changed(session).add(resource)
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk(orm_execute_state):
+    # Bulk UPDATE/DELETE statements such as the copy counter adjustments
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        mapper = orm_execute_state.bind_mapper
+        resource = RESOURCES.get(mapper.class_) if mapper is not None else None
+        if resource:
+            _changed(orm_execute_state.session).add(resource)
+
+@event.listens_for(Session, "before_commit")
+def _bump_versions(session):
+    # Flush first so pending objects are counted
+    session.flush()
+    changed = session.info.pop("changed_resources", None)
+    if changed:
+        table = DataVersion.__table__
+        session.connection().execute(
+            update(table)
+            .where(table.c.resource.in_(sorted(changed)))
+            .values(version=table.c.version + 1)
+        )
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("changed_resources", None)
+
+def ensure_version_rows(session: Session, start: int = 0):
+    """Create a counter row for every resource that doesn't have one yet"""
+    existing = set(session.exec(select(DataVersion.resource)).all())
+    for resource in sorted(set(RESOURCES.values()) - existing):
+        session.add(DataVersion(resource=resource, version=start))
+    session.commit()
+
+def latest_version(session: Session) -> int:
+    """Highest version of any resource, so a recreated table can continue past it"""
+    return session.exec(select(func.max(DataVersion.version))).first() or 0
+
+def current_etag(session: Session, resources: Iterable[str]) -> str:
+    """Build an ETag from the current versions of the given resources"""
+    resources = sorted(resources)
+    versions = dict(session.exec(
+        select(DataVersion.resource, DataVersion.version).where(DataVersion.resource.in_(resources))
+    ).all())
+    return '"' + "-".join(f"{resource[0]}{versions.get(resource, 0)}" for resource in resources) + '"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an If-None-Match header against an ETag"""
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
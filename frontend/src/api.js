@@ -55,11 +55,6 @@ const api = {
     return response.data;
   },
 
-  getBooks: async () => {
-    const response = await apiClient.get('/books/');
-    return response.data;
-  },
-
   borrowBook: async ({ bookId, userId }) => {
     const response = await apiClient.post(`/borrow/${bookId}`, { user_id: userId });
     return response.data;
@@ -127,6 +122,11 @@ const api = {
     return response.data;
   },
 
+  getUserStatisticsSummary: async (userId) => {
+    const response = await apiClient.get(`/users/${userId}/statistics/summary`);
+    return response.data;
+  },
+
   getNotifications: async (userId) => {
     try {
       const response = await apiClient.get(`/users/${userId}/notifications`);
@@ -138,6 +138,16 @@ const api = {
     }
   },
 
+  getUnreadNotificationCount: async (userId) => {
+    try {
+      const response = await apiClient.get(`/users/${userId}/notifications/unread-count`);
+      return response.data.unread_count;
+    } catch (error) {
+      console.error('Error fetching unread notification count:', error);
+      return 0;
+    }
+  },
+
   markNotificationAsRead: async (notificationId) => {
     try {
       const response = await apiClient.put(`/notifications/${notificationId}/read`);
@@ -148,6 +158,16 @@ const api = {
     }
   },
 
+  markAllNotificationsAsRead: async () => {
+    try {
+      const response = await apiClient.put('/notifications/read-all');
+      return response.data;
+    } catch (error) {
+      console.error('Error marking all notifications as read:', error);
+      return { success: false };
+    }
+  },
+
   // Announcement API
   createAnnouncement: async (announcementData) => {
     try {
@@ -231,6 +251,13 @@ const api = {
     }
   },
 
+  // Several admin dashboard panels in one request (all of them if panels is omitted)
+  getAdminDashboard: async (panels) => {
+    const query = panels ? `?panels=${panels.join(',')}` : '';
+    const response = await apiClient.get(`/admin/dashboard${query}`);
+    return response.data;
+  },
+
   // Admin detailed statistics endpoints
   getDetailedBooks: async () => {
     try {
@@ -42,6 +42,15 @@ const NotificationPanel = ({ isOpen, onClose }) => {
     }
   };
 
+  const markAllAsRead = async () => {
+    try {
+      await api.markAllNotificationsAsRead();
+      setNotifications(prev => prev.map(notif => ({ ...notif, read: true })));
+    } catch (error) {
+      console.error('Error marking all notifications as read:', error);
+    }
+  };
+
   const getNotificationIcon = (type) => {
     switch (type) {
       case 'overdue':
@@ -221,12 +230,7 @@ const NotificationPanel = ({ isOpen, onClose }) => {
         {notifications.length > 0 && (
           <div className={`p-3 border-t ${colorClasses.border.primary} text-center`}>
             <button
-              onClick={() => {
-                // Mark all as read
-                notifications.forEach(notif => {
-                  if (!notif.read) markAsRead(notif.id);
-                });
-              }}
+              onClick={markAllAsRead}
               className={`text-xs ${colorClasses.text.accent} hover:underline`}
             >
               সব পঠিত হিসেবে চিহ্নিত করুন
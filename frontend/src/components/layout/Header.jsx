@@ -20,9 +20,7 @@ const Header = () => {
 
     const loadUnreadCount = async () => {
         try {
-            const notifications = await api.getNotifications(user.id);
-            const unread = notifications.filter(n => !n.read).length;
-            setUnreadCount(unread);
+            setUnreadCount(await api.getUnreadNotificationCount(user.id));
         } catch (error) {
             console.error('Error loading notification count:', error);
         }
@@ -2,6 +2,7 @@ export const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || "http://localho
 
 export const ENDPOINTS = {
     ALL_BOOKS: "/books",
+    BOOK_PAGE: "/books/page",
     BORROW_BOOK: (id) => `/borrow/${id}`,
     DONATE_BOOK: "/donate",
     USER_PROFILE: "/user/profile",
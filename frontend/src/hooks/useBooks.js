@@ -1,14 +1,17 @@
-import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
+import { useInfiniteQuery, useMutation, useQueryClient } from "@tanstack/react-query";
 import { bookService } from '../services/api.js';
 import { QUERY_KEYS } from '../constants/api.js';
 import { toast } from "sonner";
 
-export const useBooks = () => {
-    return useQuery({
-        queryKey: [QUERY_KEYS.BOOKS],
-        queryFn: bookService.getAllBooks,
+// Pages through the catalog; filters: { category, author, available_only, sort, limit }
+export const useBooks = (filters = {}) => {
+    return useInfiniteQuery({
+        queryKey: [QUERY_KEYS.BOOKS, filters],
+        queryFn: ({ pageParam }) => bookService.getBookPage({ pageParam, filters }),
+        initialPageParam: null,
+        getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
         staleTime: 5 * 60 * 1000, // 5 minutes
-        cacheTime: 10 * 60 * 1000, // 10 minutes
+        gcTime: 10 * 60 * 1000, // 10 minutes
     });
 };
 
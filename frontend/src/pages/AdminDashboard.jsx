@@ -53,14 +53,10 @@ const AdminDashboard = () => {
   const loadRequests = async () => {
     setLoading(true);
     try {
-      const [borrowReqs, donationReqs, libStats] = await Promise.all([
-        api.getBorrowRequests(),
-        api.getDonationRequests(),
-        api.getLibraryStatistics()
-      ]);
-      setBorrowRequests(borrowReqs);
-      setDonationRequests(donationReqs);
-      setLibraryStats(libStats);
+      const dashboard = await api.getAdminDashboard(['borrow_requests', 'donation_requests', 'statistics']);
+      setBorrowRequests(dashboard.borrow_requests);
+      setDonationRequests(dashboard.donation_requests);
+      setLibraryStats(dashboard.statistics);
     } catch (error) {
       console.error('Error loading requests:', error);
     } finally {
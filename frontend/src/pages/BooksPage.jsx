@@ -0,0 +1,114 @@
+import { useState } from 'react';
+import { BookOpen } from 'lucide-react';
+import BookCard from '../components/Book.jsx';
+import { useBooks } from '../hooks/useBooks.js';
+import { useAuth } from '../context/AuthContext.jsx';
+import { PageHeader, Button, EmptyState, LoadingSpinner } from '../components/ui/ThemeComponents.jsx';
+import { colorClasses } from '../styles/colors.js';
+
+const SORT_OPTIONS = [
+    { value: 'title', label: 'শিরোনাম অনুযায়ী' },
+    { value: 'newest', label: 'নতুন বই আগে' },
+    { value: 'most_available', label: 'সবচেয়ে বেশি উপলব্ধ' },
+];
+
+const PAGE_SIZE = 24;
+
+const BooksPage = () => {
+    const [sort, setSort] = useState('title');
+    const [availableOnly, setAvailableOnly] = useState(false);
+    const { user } = useAuth();
+
+    // Keyset pages from /books/page; each "load more" fetches only the next page
+    const {
+        data,
+        isLoading,
+        isError,
+        fetchNextPage,
+        hasNextPage,
+        isFetchingNextPage,
+    } = useBooks({
+        sort,
+        available_only: availableOnly,
+        limit: PAGE_SIZE,
+        ...(user?.id ? { user_id: user.id } : {}),
+    });
+
+    const books = data?.pages.flatMap(page => page.items) ?? [];
+
+    const getAvailability = (book) => {
+        if (book.available_copies === 0) return 'borrowed';
+        if (!book.user_can_borrow) return 'reserved';
+        return 'available';
+    };
+
+    return (
+        <div className="space-y-6">
+            <PageHeader
+                title="বই সংগ্রহ"
+                subtitle="লাইব্রেরির সব বই দেখুন এবং পছন্দের বই ধার নিন"
+            />
+
+            <div className="flex flex-wrap items-center gap-4">
+                <select
+                    value={sort}
+                    onChange={(e) => setSort(e.target.value)}
+                    className={`px-3 py-2 rounded-lg border ${colorClasses.border.primary} ${colorClasses.bg.primary} ${colorClasses.text.primary}`}
+                >
+                    {SORT_OPTIONS.map(option => (
+                        <option key={option.value} value={option.value}>{option.label}</option>
+                    ))}
+                </select>
+                <label className={`flex items-center gap-2 text-sm ${colorClasses.text.secondary}`}>
+                    <input
+                        type="checkbox"
+                        checked={availableOnly}
+                        onChange={(e) => setAvailableOnly(e.target.checked)}
+                    />
+                    শুধু উপলব্ধ বই
+                </label>
+            </div>
+
+            {isLoading ? (
+                <div className="flex justify-center py-12">
+                    <LoadingSpinner size="lg" />
+                </div>
+            ) : isError ? (
+                <EmptyState
+                    icon={BookOpen}
+                    title="বই লোড করা যায়নি"
+                    description="অনুগ্রহ করে কিছুক্ষণ পরে আবার চেষ্টা করুন"
+                />
+            ) : books.length === 0 ? (
+                <EmptyState
+                    icon={BookOpen}
+                    title="কোনো বই পাওয়া যায়নি"
+                    description="এই মুহূর্তে দেখানোর মতো কোনো বই নেই"
+                />
+            ) : (
+                <>
+                    <div className="grid grid-cols-1 sm:grid-cols-2 md:grid-cols-3 lg:grid-cols-4 gap-6">
+                        {books.map(book => (
+                            <BookCard key={book.id} book={{ ...book, availability: getAvailability(book) }} />
+                        ))}
+                    </div>
+
+                    {hasNextPage && (
+                        <div className="flex justify-center">
+                            <Button
+                                variant="secondary"
+                                onClick={() => fetchNextPage()}
+                                disabled={isFetchingNextPage}
+                                loading={isFetchingNextPage}
+                            >
+                                {isFetchingNextPage ? 'লোড হচ্ছে...' : 'আরও বই দেখুন'}
+                            </Button>
+                        </div>
+                    )}
+                </>
+            )}
+        </div>
+    );
+};
+
+export default BooksPage;
@@ -41,7 +41,7 @@ const ProfilePage = () => {
     setLoading(true);
     try {
       const [stats, activities] = await Promise.all([
-        api.getUserStatistics(user.id),
+        api.getUserStatisticsSummary(user.id),
         api.getUserRecentActivities(user.id, 5, 7)
       ]);
       setUserStats(stats);
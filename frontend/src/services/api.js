@@ -67,6 +67,15 @@ export const bookService = {
         return response.data;
     },
 
+    getBookPage: async ({ pageParam = null, filters = {} } = {}) => {
+        const params = { ...filters };
+        if (pageParam) {
+            params.after = pageParam;
+        }
+        const response = await api.get(ENDPOINTS.BOOK_PAGE, { params });
+        return response.data;
+    },
+
     borrowBook: async ({ bookId, userId }) => {
         const response = await api.post(ENDPOINTS.BORROW_BOOK(bookId), { user_id: userId });
         return response.data;